@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Form, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from backend.db.db import students_collection, lecturers_collection
+from backend.db.repository import (
+    employee_id_exists, lecturer_for_login, roll_number_exists, student_for_login, student_search_terms
+)
 from passlib.context import CryptContext
 from passlib.hash import bcrypt
+from pymongo.errors import DuplicateKeyError
 import re 
 from fastapi.templating import Jinja2Templates
 from bson import ObjectId
@@ -29,10 +33,10 @@ async def login_post(
 ):
 
     if role == "student":
-        user = await students_collection.find_one({"roll_number": identifier})
+        user = await student_for_login(identifier)
         dashboard = "/student/dashboard"
     elif role == "lecturer":
-        user = await lecturers_collection.find_one({"employee_id": identifier})
+        user = await lecturer_for_login(identifier)
         dashboard = "/lecturer/dashboard"
     else:
         return templates.TemplateResponse("login.html", {"request": request, "error": "Invalid role"})
@@ -44,6 +48,10 @@ async def login_post(
     request.session["user_id"] = str(user["_id"])
     request.session["role"] = role
     request.session["name"] = user["first_name"]
+    if role == "lecturer":
+        request.session["employee_id"] = user["employee_id"]
+    else:
+        request.session.pop("employee_id", None)
 
     return RedirectResponse(url=dashboard, status_code=302)
 def is_password_strong(password: str) -> bool:
@@ -81,8 +89,7 @@ async def signup_user(
     hashed_password = bcrypt.hash(password)
 
     if role == "student":
-        exists = await students_collection.find_one({"roll_number": identifier})
-        if exists:
+        if await roll_number_exists(identifier):
             return templates.TemplateResponse("signup.html", {"request": request, "error": "Roll number already exists"})
 
         student_doc = {
@@ -96,11 +103,14 @@ async def signup_user(
             "completed_class_ids": [],
             "typing_baseline_log": {}
         }
-        await students_collection.insert_one(student_doc)
+        student_doc["search_terms"] = student_search_terms(student_doc)
+        try:
+            await students_collection.insert_one(student_doc)
+        except DuplicateKeyError:
+            return templates.TemplateResponse("signup.html", {"request": request, "error": "Roll number already exists"})
 
     elif role == "lecturer":
-        exists = await lecturers_collection.find_one({"employee_id": identifier})
-        if exists:
+        if await employee_id_exists(identifier):
             return templates.TemplateResponse("signup.html", {"request": request, "error": "Lecturer ID already exists"})
 
         lecturer_doc = {
@@ -113,7 +123,10 @@ async def signup_user(
             "current_class_ids": [],
             "total_classes_taught": 0
         }
-        await lecturers_collection.insert_one(lecturer_doc)
+        try:
+            await lecturers_collection.insert_one(lecturer_doc)
+        except DuplicateKeyError:
+            return templates.TemplateResponse("signup.html", {"request": request, "error": "Lecturer ID already exists"})
 
     else:
         return templates.TemplateResponse("signup.html", {"request": request, "error": "Invalid role"})
@@ -1,10 +1,28 @@
-from fastapi import APIRouter, Request, Form, HTTPException
+import asyncio
+import csv
+import io
+import logging
+from fastapi import APIRouter, Request, Form, HTTPException, BackgroundTasks, File, UploadFile
 from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from backend.db.db import classes_collection, students_collection, lecturers_collection, sessions_collection, engagement_metrics_collection, typing_logs_collection
+from backend.db.dashboard import load_lecturer_dashboard
+from backend.db.repository import (
+    CLASS_ROSTER, ID_ONLY, class_by_code, class_by_id, search_students, session_for_class, session_rollups,
+    student_by_id, students_by_roll_numbers, typing_log_for_student
+)
+from backend.db.rollups import summarize_rollups
+from backend.db.rosters import create_class, existing_roll_numbers, update_roster
+from backend.db.db import classes_collection, lecturers_collection, sessions_collection, engagement_metrics_collection, typing_logs_collection, session_rollups_collection
 from fastapi.responses import HTMLResponse
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from backend.services.engagement_engine import prepare_lecture, transcript_hash
+from backend.services.question_answering import build_transcript_index
+from backend.services.scoring_pool import scoring_pool, ScoringPoolSaturated
+from backend.services.scoring_worker import EMBEDDED_WORKER
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 templates = Jinja2Templates(directory="frontend/lecturer_dashboard/templates")
@@ -13,25 +31,11 @@ templates = Jinja2Templates(directory="frontend/lecturer_dashboard/templates")
 async def lecturer_dashboard(request: Request):
     flash_message = request.cookies.get("flash_message")
 
-    employee_id = await _get_employee_id_from_session(request)
-    if not employee_id:
-        return RedirectResponse("/login", status_code=302)
-
-    lecturer = await lecturers_collection.find_one({"employee_id": employee_id})
-    if not lecturer:
+    user_id = request.session.get("user_id")
+    dashboard = await load_lecturer_dashboard(ObjectId(user_id)) if user_id and ObjectId.is_valid(user_id) else None
+    if not dashboard:
         return RedirectResponse("/login", status_code=302)
-
-    all_classes = await classes_collection.find({"employee_id": employee_id}).to_list(length=100)
-
-    current_classes = []
-    completed_classes = []
-
-    for cls in all_classes:
-        session_exists = await sessions_collection.find_one({"class_id": cls["_id"]})
-        if session_exists:
-            completed_classes.append(cls)
-        else:
-            current_classes.append(cls)
+    lecturer, current_classes, completed_classes = dashboard
 
     response = templates.TemplateResponse("lecturer_dashboard.html", {
         "request": request,
@@ -51,12 +55,8 @@ async def lecturer_dashboard(request: Request):
 
 @router.get("/lecturer/add-class", response_class=HTMLResponse)
 async def add_class_form(request: Request):
-    students = await students_collection.find({}).to_list(length=100)
-    return templates.TemplateResponse("add_class.html", 
-    {
-        "request": request,
-        "students": students
-    })
+    # Students are picked through the /lecturer/students/search typeahead.
+    return templates.TemplateResponse("add_class.html", {"request": request})
 
 @router.post("/lecturer/add-class")
 async def add_class(
@@ -77,20 +77,10 @@ async def add_class(
         "created_at": datetime.utcnow()
     }
 
-    await classes_collection.insert_one(class_doc)
-
-    for sid in student_ids:
-        await students_collection.update_one(
-            {"roll_number": sid},
-            {"$addToSet": {"class_ids": class_id}}
-        )
-    await lecturers_collection.update_one(
-        {"employee_id": employee_id},
-        {
-            "$addToSet": {"current_class_ids": class_id},
-            "$inc": {"total_classes_taught": 1}
-        }
-    )
+    try:
+        await create_class(class_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=f"Class {class_id} already exists")
 
     return RedirectResponse(url="/lecturer/dashboard", status_code=303)
 
@@ -103,10 +93,11 @@ async def start_session(class_id: str):
 
     class_obj_id = ObjectId(class_id)
 
-    existing_sessions = await sessions_collection.find({"class_id": class_obj_id}).to_list(length=100)
+    existing_sessions = await sessions_collection.find({"class_id": class_obj_id}, ID_ONLY).to_list(length=100)
     if existing_sessions:
         session_ids = [session["_id"] for session in existing_sessions]
         await sessions_collection.delete_many({"_id": {"$in": session_ids}})
+        await session_rollups_collection.delete_many({"_id": {"$in": session_ids}})
         await classes_collection.update_one(
             {"_id": class_obj_id},
             {"$pull": {"sessions": {"$in": session_ids}}}
@@ -134,18 +125,29 @@ async def start_session(class_id: str):
 async def upload_transcript(
     class_id: str,
     session_id: str,
+    background_tasks: BackgroundTasks,
     transcript_text: str = Form(...)
 ):
     if not (ObjectId.is_valid(class_id) and ObjectId.is_valid(session_id)):
         raise HTTPException(status_code=400, detail="Invalid IDs")
 
+    text_hash = transcript_hash(transcript_text)
     result = await sessions_collection.update_one(
         {"_id": ObjectId(session_id), "class_id": ObjectId(class_id)},
-        {"$set": {"transcript_text": transcript_text}}
+        {
+            "$set": {"transcript_text": transcript_text, "transcript_hash": text_hash},
+            "$unset": {"lecture_features": "", "transcript_index": ""}
+        }
     )
-    if result.modified_count == 0:
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Session not found")
 
+    # Lecture features need the scoring models, which only the embedded
+    # worker loads here; a separate worker computes them on first use.
+    if EMBEDDED_WORKER:
+        background_tasks.add_task(_precompute_lecture_features, ObjectId(session_id), transcript_text, text_hash)
+    background_tasks.add_task(_precompute_transcript_index, ObjectId(session_id), transcript_text, text_hash)
+
     response = RedirectResponse(url="/lecturer/dashboard", status_code=303)
     response.set_cookie(key="flash_message", value="Transcript saved successfully!", max_age=5)  # cookie lasts 5 seconds
     return response
@@ -155,12 +157,47 @@ async def record_lecture_ui(request: Request, class_id: str):
     return templates.TemplateResponse("record_lecture2.html", {"request": request, "class_id": class_id})
 
 
+async def _precompute_lecture_features(session_id, transcript_text, text_hash):
+    try:
+        features = await scoring_pool.run(prepare_lecture, transcript_text)
+    except ScoringPoolSaturated:
+        # Scoring falls back to computing (and caching) them on first use.
+        return
+    except Exception:
+        logger.exception("Could not precompute lecture features for session %s", session_id)
+        return
+    # Skip the write if the transcript was replaced while we were computing.
+    await sessions_collection.update_one(
+        {"_id": session_id, "transcript_hash": text_hash},
+        {"$set": {"lecture_features": features}}
+    )
+
+
+async def _precompute_transcript_index(session_id, transcript_text, text_hash):
+    try:
+        index = await asyncio.to_thread(build_transcript_index, transcript_text)
+    except Exception:
+        # Questions build (and cache) the index on first use instead.
+        logger.exception("Could not index transcript for session %s", session_id)
+        return
+    await sessions_collection.update_one(
+        {"_id": session_id, "transcript_hash": text_hash},
+        {"$set": {"transcript_index": index}}
+    )
+
+
 async def _get_employee_id_from_session(request: Request):
     user_id = request.session.get("user_id")
     if not user_id:
         return None
-    user_doc = await lecturers_collection.find_one({"_id": ObjectId(user_id)})
-    return user_doc["employee_id"] if user_doc else None
+    # Stored at login; sessions from before that are filled in on first use.
+    if request.session.get("role") == "lecturer" and request.session.get("employee_id"):
+        return request.session["employee_id"]
+    user_doc = await lecturers_collection.find_one({"_id": ObjectId(user_id)}, {"employee_id": 1})
+    if not user_doc:
+        return None
+    request.session["employee_id"] = user_doc["employee_id"]
+    return user_doc["employee_id"]
 
 
 @router.get("/lecturer/analytics/class/{class_id}", response_class=HTMLResponse)
@@ -168,7 +205,7 @@ async def class_analytics(request: Request, class_id: str):
     if not ObjectId.is_valid(class_id):
         return HTMLResponse("Invalid class ID", status_code=400)
 
-    class_obj = await classes_collection.find_one({"_id": ObjectId(class_id)})
+    class_obj = await class_by_id(ObjectId(class_id), CLASS_ROSTER)
     if not class_obj:
         return HTMLResponse("Class not found", status_code=404)
 
@@ -177,30 +214,19 @@ async def class_analytics(request: Request, class_id: str):
     if not sessions:
         return HTMLResponse("No sessions recorded yet.", status_code=404)
 
-    logs = await typing_logs_collection.find({
-        "session_id": {"$in": sessions}
-    }).to_list(length=200)
-
-    all_students = await students_collection.find(
-        {"roll_number": {"$in": student_rolls}}
-    ).to_list(length=100)
+    # Per-session rollups are kept current as logs are submitted and scored.
+    summary = summarize_rollups(await session_rollups(sessions).to_list(length=None))
+    all_students = await students_by_roll_numbers(student_rolls).to_list(length=None)
 
-    submitted_student_ids = {str(log["student_id"]) for log in logs}
-    submitted_students = [s for s in all_students if str(s["_id"]) in submitted_student_ids]
-    non_submitted_students = [s for s in all_students if str(s["_id"]) not in submitted_student_ids]
+    submitted_student_ids = summary["submitted_student_ids"]
+    submitted_students = [s for s in all_students if s["_id"] in submitted_student_ids]
+    non_submitted_students = [s for s in all_students if s["_id"] not in submitted_student_ids]
 
 
     total_students = len(all_students)
-    engagement_sum = 0
-
-    for log in logs:
-        score = log.get("analysis_report", {}).get("engagement_score", -1)
-        if score == 1:
-            engagement_sum += 1
-        elif score == 0:
-            engagement_sum += 0.5
-        else: 
-            engagement_sum += 0
+    # Fully engaged counts 1, partly engaged 0.5; unscored and disengaged count 0.
+    histogram = summary["score_histogram"]
+    engagement_sum = histogram.get("1", 0) + 0.5 * histogram.get("0", 0)
 
     avg_engagement = (engagement_sum / total_students) * 100 if total_students > 0 else 0
 
@@ -209,32 +235,52 @@ async def class_analytics(request: Request, class_id: str):
         "class_obj": class_obj,
         "submitted_students": submitted_students,
         "non_submitted_students": non_submitted_students,
-        "avg_engagement": round(avg_engagement, 2)
+        "avg_engagement": round(avg_engagement, 2),
+        "score_histogram": histogram,
+        "typing_styles": summary["typing_styles"]
     })
 
 
 
 @router.get("/lecturer/class/{class_id}/manage", response_class=HTMLResponse)
 async def manage_class_page(request: Request, class_id: str):
-    user_id = request.session.get("user_id")
-    lecturer = await lecturers_collection.find_one({"_id": ObjectId(user_id)})
-    
-    class_obj = await classes_collection.find_one({"class_id": class_id})
+    class_obj = await class_by_code(class_id, CLASS_ROSTER)
     if not class_obj:
         raise HTTPException(status_code=404, detail="Class not found.")
 
-    current_students = await students_collection.find(
-        {"roll_number": {"$in": class_obj["student_ids"]}}
-    ).to_list(length=100)
-
-    all_students = await students_collection.find().to_list(length=100)
-    available_students = [s for s in all_students if s["roll_number"] not in class_obj["student_ids"]]
+    current_students = await students_by_roll_numbers(class_obj["student_ids"]).to_list(length=None)
 
     return templates.TemplateResponse("manage_class.html", {
         "request": request,
         "class_obj": class_obj,
-        "current_students": current_students,
-        "available_students": available_students
+        "current_students": current_students
+    })
+
+
+@router.get("/lecturer/students/search")
+async def student_search(request: Request, q: str = "", after: str = None, exclude_class: str = None, limit: int = 20):
+    """Typeahead over roll numbers and names, a page at a time.
+
+    Returns ``next_after`` to pass as ``after`` for the next page, or null on
+    the last one. ``exclude_class`` leaves out students already in that class.
+    """
+    if not await _get_employee_id_from_session(request):
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    limit = max(1, min(limit, 100))
+
+    roster = []
+    if exclude_class:
+        class_doc = await class_by_code(exclude_class, {"student_ids": 1})
+        roster = class_doc.get("student_ids", []) if class_doc else []
+
+    students = await search_students(q, after, roster, limit + 1).to_list(length=limit + 1)
+    page = students[:limit]
+    return JSONResponse({
+        "students": [
+            {"roll_number": s["roll_number"], "first_name": s.get("first_name", ""), "last_name": s.get("last_name", "")}
+            for s in page
+        ],
+        "next_after": page[-1]["roll_number"] if len(students) > limit else None
     })
 
 @router.post("/lecturer/class/{class_id}/update-students")
@@ -244,46 +290,76 @@ async def update_class_students(
     add_student_ids: list[str] = Form(default=[]),
     remove_student_ids: list[str] = Form(default=[])
 ):
-    class_doc = await classes_collection.find_one({"class_id": class_id})
+    class_doc = await class_by_code(class_id, ID_ONLY)
     if not class_doc:
         raise HTTPException(status_code=404, detail="Class not found.")
 
-    await classes_collection.update_one(
-        {"class_id": class_id},
-        {"$addToSet": {"student_ids": {"$each": add_student_ids}}}
-    )
-    for sid in add_student_ids:
-        await students_collection.update_one(
-            {"roll_number": sid},
-            {"$addToSet": {"class_ids": class_id}}
-        )
-
-    await classes_collection.update_one(
-        {"class_id": class_id},
-        {"$pull": {"student_ids": {"$in": remove_student_ids}}}
-    )
-    for sid in remove_student_ids:
-        await students_collection.update_one(
-            {"roll_number": sid},
-            {"$pull": {"class_ids": class_id}}
-        )
+    await update_roster(class_id, add_student_ids, remove_student_ids)
 
     return RedirectResponse(f"/lecturer/class/{class_id}/manage", status_code=303)
 
 
+def _parse_roster_csv(content):
+    """Roll numbers from a CSV with a roll_number column, or from its first column."""
+    rows = [row for row in csv.reader(io.StringIO(content)) if row and any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = header.index("roll_number") if "roll_number" in header else 0
+    if "roll_number" in header:
+        rows = rows[1:]
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+
+@router.post("/lecturer/class/{class_id}/roster/import")
+async def import_roster(
+    request: Request,
+    class_id: str,
+    file: UploadFile = File(...),
+    mode: str = Form(default="add")
+):
+    """Enrol every roll number in a CSV; mode=replace also unenrols everyone not in it.
+
+    Unknown roll numbers are reported and skipped.
+    """
+    employee_id = await _get_employee_id_from_session(request)
+    if not employee_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if mode not in ("add", "replace"):
+        raise HTTPException(status_code=400, detail="mode must be 'add' or 'replace'")
+
+    class_doc = await classes_collection.find_one({"class_id": class_id, "employee_id": employee_id}, {"student_ids": 1})
+    if not class_doc:
+        raise HTTPException(status_code=404, detail="Class not found.")
+
+    try:
+        roll_numbers = list(dict.fromkeys(_parse_roster_csv((await file.read()).decode("utf-8-sig"))))
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read CSV: {e}")
+
+    known = await existing_roll_numbers(roll_numbers)
+    current = set(class_doc.get("student_ids", []))
+    add = [r for r in roll_numbers if r in known and r not in current]
+    remove = sorted(current - set(roll_numbers)) if mode == "replace" else []
+    await update_roster(class_id, add, remove)
+
+    return JSONResponse({
+        "added": add,
+        "removed": remove,
+        "unknown": [r for r in roll_numbers if r not in known]
+    })
+
+
 @router.get("/lecturer/analytics/student/{student_id}/class/{class_id}", response_class=HTMLResponse)
 async def view_student_engagement(request: Request, student_id: str, class_id: str):
-    student = await students_collection.find_one({"_id": ObjectId(student_id)})
-    class_doc = await classes_collection.find_one({"_id": ObjectId(class_id)})
-    session = await sessions_collection.find_one({"class_id": ObjectId(class_id)})
+    student = await student_by_id(ObjectId(student_id))
+    class_doc = await class_by_id(ObjectId(class_id))
+    session = await session_for_class(ObjectId(class_id))
 
     if not (student and class_doc and session):
         return HTMLResponse("Data not found", status_code=404)
 
-    typing_log = await typing_logs_collection.find_one({
-        "student_id": ObjectId(student_id),
-        "session_id": session["_id"]
-    })
+    typing_log = await typing_log_for_student(ObjectId(student_id), session["_id"])
 
     essay_text = ""
     if typing_log:
@@ -309,7 +385,7 @@ async def submit_feedback(
     class_id: str,
     feedback: str = Form(...)
 ):
-    session = await sessions_collection.find_one({"class_id": ObjectId(class_id)})
+    session = await session_for_class(ObjectId(class_id))
 
     if not session:
         return JSONResponse({"error": "Session not found"}, status_code=404)
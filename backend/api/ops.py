@@ -0,0 +1,30 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from backend.services import model_registry
+from backend.services.engagement_engine import SCORING_MODELS
+from backend.services.inference_batcher import inference_metrics
+from backend.services.question_answering import QA_MODELS
+from backend.services.scoring_worker import EMBEDDED_WORKER
+
+router = APIRouter()
+
+# What this process serves with, scoring models first: they are only
+# loaded here when the embedded worker scores in-process.
+WEB_MODELS = (SCORING_MODELS if EMBEDDED_WORKER else ()) + QA_MODELS
+
+@router.get("/metrics/inference")
+async def inference_batching_metrics():
+    return inference_metrics()
+
+@router.get("/healthz")
+async def healthz():
+    # The process is up and serving; models may still be loading.
+    return {"status": "ok"}
+
+@router.get("/readyz")
+async def readyz():
+    ready = model_registry.is_ready(*WEB_MODELS)
+    return JSONResponse({
+        "status": "ready" if ready else "warming_up",
+        "models": model_registry.status()
+    }, status_code=200 if ready else 503)
@@ -1,11 +1,27 @@
+import asyncio
+import json
 from fastapi import APIRouter, Request, Form
-from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
+from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from backend.db.db import students_collection, typing_logs_collection, essays_collection,sessions_collection, classes_collection
+from backend.db.db import students_collection, typing_logs_collection, essays_collection
 from bson import ObjectId
 from datetime import datetime
-from backend.services.engagement_engine import evaluate_engagement
-from backend.services.question_answering import answer_question_from_transcript
+from backend.db.jobs import enqueue_scoring_job
+from backend.db.repository import (
+    ID_ONLY, SESSION_CLASS, SESSION_TRANSCRIPT, STUDENT_PROFILE, class_by_code, classes_by_codes, classes_by_ids,
+    session_by_id, session_for_class, student_by_id, typing_log_for_student
+)
+from backend.db.rollups import record_submission
+from backend.db.transactions import run_in_transaction
+from backend.db.typing_streams import (
+    InvalidWordEvent, StreamConflict, StreamFinalized, StreamTooLarge, create_typing_stream, get_typing_stream,
+    append_typing_events, finalize_typing_stream
+)
+from backend.services import model_registry
+from backend.services.engagement_engine import SCORING_MODELS
+from backend.services.question_answering import QA_MODELS, answer_question_from_transcript, stream_answer
+from backend.services.scoring_worker import EMBEDDED_WORKER
+from backend.services.typing_metrics.incremental import TypingAggregate
 from starlette.middleware.sessions import SessionMiddleware
 
 router = APIRouter()
@@ -31,32 +47,57 @@ async def submit_typing_data(request: Request):
             return JSONResponse({"error": "Not logged in"}, status_code=401)
 
         session_id = request.session.get("active_session_id")
-        essay_text = data.get("essay_text", "")  
 
-        student = await students_collection.find_one({"_id": ObjectId(student_id)})
-        session = await sessions_collection.find_one({"_id": ObjectId(session_id)})
+        student = await student_by_id(ObjectId(student_id), ID_ONLY)
+        session = await session_by_id(ObjectId(session_id), SESSION_CLASS)
 
         if not student or not session:
             return JSONResponse({"error": "Invalid student or session"}, status_code=404)
 
-        lecture_text = session.get("transcript_text", "")
         class_id = session.get("class_id")
 
-        essay_doc = {
-            "essay_text": essay_text,
-            "typing_data": data.get("typing_data", {}),
-            "lecture_text": lecture_text
-        }
-
-        report = await evaluate_engagement(essay_doc)
+        typing_metrics = None
+        stream = None
+        stream_id = data.pop("stream_id", None)
+        if stream_id:
+            # Words were streamed while the student typed; the final POST only
+            # carries the session timings, and the metrics are already summed.
+            if not ObjectId.is_valid(stream_id):
+                return JSONResponse({"error": "Invalid stream ID"}, status_code=400)
+            stream = await get_typing_stream(ObjectId(stream_id), ObjectId(student_id))
+            if not stream or stream["session_id"] != ObjectId(session_id):
+                return JSONResponse({"error": "Typing stream not found"}, status_code=404)
+            if stream.get("finalized"):
+                return JSONResponse({"error": "Typing stream already submitted"}, status_code=409)
+            typing_data = data.setdefault("typing_data", {})
+            typing_data["words"] = stream["words"]
+            typing_metrics = TypingAggregate.from_dict(stream["state"]).finalize(
+                typing_data.get("duration_seconds", 0)
+            )
 
-        await typing_logs_collection.insert_one({
+        # The log and its scoring job are written together so the submission
+        # survives a crash; a scoring worker fills in analysis_report later.
+        log_doc = {
             "student_id": ObjectId(student_id),
             "session_id": ObjectId(session_id),
             "raw_log": data,
-            "analysis_report": report,
+            "status": "pending",
             "timestamp": datetime.utcnow()
-        })
+        }
+        if typing_metrics is not None:
+            log_doc["typing_metrics"] = typing_metrics
+
+        async def write_log(db_session):
+            # Closing the stream in the same transaction means a stream is
+            # turned into at most one log, however often it is submitted.
+            if stream is not None:
+                await finalize_typing_stream(stream, session=db_session)
+            result = await typing_logs_collection.insert_one(log_doc, session=db_session)
+            await enqueue_scoring_job(result.inserted_id, session=db_session)
+            await record_submission(ObjectId(session_id), class_id, ObjectId(student_id), session=db_session)
+            return result.inserted_id
+
+        log_id = await run_in_transaction(write_log)
 
         if class_id:
             await students_collection.update_one(
@@ -64,15 +105,100 @@ async def submit_typing_data(request: Request):
                 {"$addToSet": {"completed_class_ids": ObjectId(class_id)}}  
             )
 
+        return JSONResponse({
+            "status": "pending",
+            "message": _pending_message("Typing log received and queued for evaluation."),
+            "log_id": str(log_id),
+            "status_url": f"/student/typing-test/{log_id}/status"
+        }, status_code=202)
+
+    except StreamFinalized as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    except StreamConflict as e:
+        return JSONResponse({"error": str(e), "next_seq": e.expected_seq}, status_code=409)
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+
+@router.post("/student/typing-test/stream")
+async def start_typing_stream(request: Request):
+    student_id = request.session.get("user_id")
+    session_id = request.session.get("active_session_id")
+    if not student_id:
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    if not session_id:
+        return JSONResponse({"error": "No active session"}, status_code=404)
+
+    stream_id = await create_typing_stream(ObjectId(student_id), ObjectId(session_id))
+    return JSONResponse({"stream_id": str(stream_id), "next_seq": 0}, status_code=201)
+
+
+@router.post("/student/typing-test/stream/{stream_id}/events")
+async def append_typing_stream(request: Request, stream_id: str):
+    student_id = request.session.get("user_id")
+    if not student_id:
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    if not ObjectId.is_valid(stream_id):
+        return JSONResponse({"error": "Invalid stream ID"}, status_code=400)
+
+    data = await request.json()
+    seq = data.get("seq")
+    words = data.get("words", [])
+    if not isinstance(seq, int) or not isinstance(words, list):
+        return JSONResponse({"error": "Expected integer seq and a list of words"}, status_code=400)
+
+    stream = await get_typing_stream(
+        ObjectId(stream_id), ObjectId(student_id), {"state": 1, "next_seq": 1, "finalized": 1}
+    )
+    if not stream:
+        return JSONResponse({"error": "Typing stream not found"}, status_code=404)
+
+    try:
+        next_seq = await append_typing_events(stream, seq, words)
+    except StreamConflict as e:
+        return JSONResponse({"error": str(e), "next_seq": e.expected_seq}, status_code=409)
+    except StreamTooLarge as e:
+        return JSONResponse({"error": str(e)}, status_code=413)
+    except InvalidWordEvent as e:
+        return JSONResponse({"error": f"Malformed word event: {e}"}, status_code=400)
+
+    return JSONResponse({"next_seq": next_seq})
+
+
+def _pending_message(message):
+    # Submissions are queued either way; just say why the wait may be longer.
+    # A separate worker's models aren't visible from here.
+    if EMBEDDED_WORKER and not model_registry.is_ready(*SCORING_MODELS):
+        return message + " Scoring models are warming up, so this may take a few minutes."
+    return message
+
+
+@router.get("/student/typing-test/{log_id}/status")
+async def typing_test_status(request: Request, log_id: str):
+    student_id = request.session.get("user_id")
+    if not student_id:
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    if not ObjectId.is_valid(log_id):
+        return JSONResponse({"error": "Invalid log ID"}, status_code=400)
+
+    typing_log = await typing_logs_collection.find_one(
+        {"_id": ObjectId(log_id), "student_id": ObjectId(student_id)},
+        {"status": 1, "analysis_report": 1}
+    )
+    if not typing_log:
+        return JSONResponse({"error": "Typing log not found"}, status_code=404)
+
+    # Logs written before the queue existed have a report but no status.
+    status = typing_log.get("status", "completed")
+    if status == "completed":
         return JSONResponse({
             "status": "success",
             "message": "Typing log analyzed and evaluated.",
-            "report": report
+            "report": typing_log.get("analysis_report", {})
         })
-    
-
-    except Exception as e:
-        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+    if status == "failed":
+        return JSONResponse({"status": "failed", "message": "Evaluation failed. Please contact your lecturer."})
+    return JSONResponse({"status": status, "message": _pending_message("Evaluation in progress.")})
 
 
 
@@ -83,17 +209,12 @@ async def student_dashboard(request: Request):
     if role != "student":
         return RedirectResponse("/login", status_code=302)
 
-    student = await students_collection.find_one({"_id": ObjectId(user_id)})
+    student = await student_by_id(ObjectId(user_id), STUDENT_PROFILE)
     if not student:
         return RedirectResponse("/login", status_code=302)
 
-    enrolled_classes = await classes_collection.find(
-        {"class_id": {"$in": student["class_ids"]}}
-    ).to_list(length=100)
-
-    completed_classes = await classes_collection.find(
-        {"_id": {"$in": student["completed_class_ids"]}}
-    ).to_list(length=100)
+    enrolled_classes = await classes_by_codes(student.get("class_ids", [])).to_list(length=100)
+    completed_classes = await classes_by_ids(student.get("completed_class_ids", [])).to_list(length=100)
 
     completed_class_ids = {cls["class_id"] for cls in completed_classes if "class_id" in cls}
 
@@ -117,11 +238,11 @@ async def prepare_typing_test(request: Request, class_id: str):
     if role != "student":
         return RedirectResponse("/login", status_code=302)
 
-    student = await students_collection.find_one({"_id": ObjectId(user_id)})
+    student = await student_by_id(ObjectId(user_id))
     if not student:
         return RedirectResponse("/login", status_code=302)
 
-    class_doc = await classes_collection.find_one({"class_id": class_id})
+    class_doc = await class_by_code(class_id, ID_ONLY)
     if not class_doc:
         # Class doesn't exist
         return templates.TemplateResponse("student_dashboard.html", {
@@ -133,7 +254,7 @@ async def prepare_typing_test(request: Request, class_id: str):
     class_obj_id = class_doc["_id"] 
 
 
-    session = await sessions_collection.find_one({"class_id": class_obj_id})
+    session = await session_for_class(class_obj_id)
     if not session:
         request.session["flash_error"] = f"No session recorded yet for class {class_id}."
         return RedirectResponse("/student/dashboard", status_code=302)
@@ -144,20 +265,86 @@ async def prepare_typing_test(request: Request, class_id: str):
     return RedirectResponse("/student/typing-test", status_code=302)
 
 
+async def _qa_session(request, class_id, question):
+    """The class's session with its transcript, or an error response."""
+    if not request.session.get("user_id") or request.session.get("role") != "student":
+        return None, JSONResponse({"error": "Not logged in"}, status_code=401)
+    if not question:
+        return None, JSONResponse({"error": "Expected a question"}, status_code=400)
+
+    class_doc = await class_by_code(class_id, ID_ONLY)
+    session = await session_for_class(
+        class_doc["_id"], {"transcript_text": 1, "transcript_index": 1}
+    ) if class_doc else None
+    if not session or not session.get("transcript_text", "").strip():
+        return None, JSONResponse({"error": "No transcript for this class yet"}, status_code=404)
+
+    if not model_registry.is_ready(*QA_MODELS):
+        return None, JSONResponse(
+            {"status": "warming_up", "message": "The question answering models are still loading. Try again shortly."},
+            status_code=503, headers={"Retry-After": "30"}
+        )
+    return session, None
+
+
+@router.post("/student/class/{class_id}/ask")
+async def ask_question(request: Request, class_id: str):
+    try:
+        question = (await request.json()).get("question", "").strip()
+    except Exception:
+        question = ""
+    session, error = await _qa_session(request, class_id, question)
+    if error:
+        return error
+
+    answer = await asyncio.to_thread(
+        answer_question_from_transcript, session["transcript_text"], question,
+        stored_index=session.get("transcript_index")
+    )
+    return JSONResponse({"question": question, "answer": answer})
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/student/class/{class_id}/ask/stream")
+async def ask_question_stream(request: Request, class_id: str, question: str = ""):
+    """Server-sent events: ``token`` events with new text, then ``done`` with the full answer."""
+    question = question.strip()
+    session, error = await _qa_session(request, class_id, question)
+    if error:
+        return error
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        pieces = asyncio.Queue()
+        future = await asyncio.to_thread(
+            stream_answer, session["transcript_text"], question,
+            lambda text: loop.call_soon_threadsafe(pieces.put_nowait, text),
+            stored_index=session.get("transcript_index")
+        )
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(pieces.put_nowait, None))
+        while (text := await pieces.get()) is not None:
+            yield _sse("token", {"text": text})
+        try:
+            yield _sse("done", {"answer": future.result()})
+        except Exception as e:
+            yield _sse("error", {"message": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 @router.get("/student/class/{class_id}/view-feedback", response_class=HTMLResponse)
 async def view_feedback_detail(request: Request, class_id: str):
     user_id = request.session.get("user_id")
     if not user_id:
         return RedirectResponse("/login", status_code=302)
 
-    student = await students_collection.find_one({"_id": ObjectId(user_id)})
-    class_doc = await classes_collection.find_one({"class_id": class_id})
-    session = await sessions_collection.find_one({"class_id": class_doc["_id"]}) if class_doc else None
+    class_doc = await class_by_code(class_id)
+    session = await session_for_class(class_doc["_id"], SESSION_TRANSCRIPT) if class_doc else None
 
-    typing_log = await typing_logs_collection.find_one({
-        "student_id": ObjectId(user_id),
-        "session_id": session["_id"] if session else None
-    }) if session else None
+    typing_log = await typing_log_for_student(ObjectId(user_id), session["_id"]) if session else None
 
     essay_text = typing_log.get("raw_log", {}).get("essay_text", "") if typing_log else "Not found"
     transcript_text = session.get("transcript_text", "") if session else "Not available"
@@ -0,0 +1,44 @@
+from backend.db.db import db
+
+DASHBOARD_CLASS_LIMIT = 100
+
+
+async def load_lecturer_dashboard(lecturer_id, database=db):
+    """(lecturer, current_classes, completed_classes) in one aggregation, or None.
+
+    A class is completed once it has a session. The classes and the session
+    check are $lookup stages, so the page costs one round trip however many
+    classes the lecturer has. Requires MongoDB 5.0+ ($lookup with both
+    localField and pipeline).
+    """
+    pipeline = [
+        {"$match": {"_id": lecturer_id}},
+        {"$project": {"first_name": 1, "last_name": 1, "employee_id": 1}},
+        {"$lookup": {
+            "from": "classes",
+            "localField": "employee_id",
+            "foreignField": "employee_id",
+            "pipeline": [
+                {"$limit": DASHBOARD_CLASS_LIMIT},
+                {"$project": {"class_id": 1, "subject": 1}},
+                {"$lookup": {
+                    "from": "sessions",
+                    "localField": "_id",
+                    "foreignField": "class_id",
+                    "pipeline": [{"$limit": 1}, {"$project": {"_id": 1}}],
+                    "as": "sessions"
+                }},
+                {"$set": {"has_session": {"$gt": [{"$size": "$sessions"}, 0]}}},
+                {"$unset": "sessions"}
+            ],
+            "as": "classes"
+        }}
+    ]
+    docs = await database["lecturers"].aggregate(pipeline).to_list(length=1)
+    if not docs:
+        return None
+    lecturer = docs[0]
+    classes = lecturer.pop("classes")
+    current_classes = [cls for cls in classes if not cls["has_session"]]
+    completed_classes = [cls for cls in classes if cls["has_session"]]
+    return lecturer, current_classes, completed_classes
@@ -15,3 +15,6 @@ classes_collection = db["classes"]
 sessions_collection = db["sessions"]
 engagement_metrics_collection = db["engagement_metrics"]
 typing_logs_collection = db["typing_logs"]
+scoring_jobs_collection = db["scoring_jobs"]
+typing_streams_collection = db["typing_streams"]
+session_rollups_collection = db["session_rollups"]
@@ -0,0 +1,75 @@
+import logging
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import PyMongoError
+from backend.db.db import db
+
+logger = logging.getLogger(__name__)
+
+# Every index the app relies on, by collection. Unique indexes back the
+# "already exists" checks in auth and add_class, which are not atomic on
+# their own. create_indexes is a no-op for an index that already exists
+# with the same options, so this is safe to apply on every startup.
+INDEXES = {
+    "students": [
+        IndexModel([("roll_number", ASCENDING)], name="roll_number_unique", unique=True),
+        # Typeahead: prefix regex on search_terms, ordered by roll_number.
+        IndexModel([("search_terms", ASCENDING), ("roll_number", ASCENDING)], name="search_terms_roll_number"),
+    ],
+    "lecturers": [
+        IndexModel([("employee_id", ASCENDING)], name="employee_id_unique", unique=True),
+    ],
+    "classes": [
+        IndexModel([("class_id", ASCENDING)], name="class_id_unique", unique=True),
+        IndexModel([("employee_id", ASCENDING)], name="employee_id"),
+    ],
+    "sessions": [
+        IndexModel([("class_id", ASCENDING)], name="class_id"),
+    ],
+    "typing_logs": [
+        # Serves both "all logs of these sessions" and "this student's log
+        # for this session".
+        IndexModel([("session_id", ASCENDING), ("student_id", ASCENDING)], name="session_student"),
+        # requeue_orphaned_logs: pending logs past the grace period.
+        IndexModel([("status", ASCENDING), ("timestamp", ASCENDING)], name="status_timestamp"),
+    ],
+    "scoring_jobs": [
+        # One per branch of claim_scoring_job's $or.
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)], name="status_available_at"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease_expires_at"),
+        # requeue_orphaned_logs' $lookup from typing_logs.
+        IndexModel([("typing_log_id", ASCENDING)], name="typing_log_id"),
+    ],
+}
+
+
+class IndexBuildError(Exception):
+    """Raised by ensure_indexes with every index that couldn't be built."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__("; ".join(f"{collection}.{name}: {error}" for collection, name, error in failures))
+
+
+async def ensure_indexes(database=db):
+    """Create any missing index in INDEXES; returns the names per collection.
+
+    Each index is built on its own, so one that fails (a unique index over
+    existing duplicates, or a name reused with different options) doesn't
+    keep the others from being built. Raises IndexBuildError listing every
+    failure once the rest are done.
+    """
+    created = {}
+    failures = []
+    for collection, models in INDEXES.items():
+        created[collection] = []
+        for model in models:
+            name = model.document["name"]
+            try:
+                created[collection] += await database[collection].create_indexes([model])
+            except PyMongoError as e:
+                logger.error("Could not create index %s on %s: %s", name, collection, e)
+                failures.append((collection, name, e))
+        logger.info("Indexes on %s: %s", collection, ", ".join(created[collection]) or "none")
+    if failures:
+        raise IndexBuildError(failures)
+    return created
@@ -0,0 +1,131 @@
+import os
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from backend.db.db import scoring_jobs_collection, typing_logs_collection
+
+VISIBILITY_TIMEOUT = int(os.getenv("SCORING_VISIBILITY_TIMEOUT", "300"))
+MAX_ATTEMPTS = int(os.getenv("SCORING_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF = int(os.getenv("SCORING_RETRY_BACKOFF", "30"))
+ORPHAN_GRACE = int(os.getenv("SCORING_ORPHAN_GRACE", "60"))
+
+# A job is "pending" until a worker claims it, "running" while that worker
+# holds its lease, and finally "done" or "failed". A running job whose lease
+# has expired (the worker died) becomes claimable again.
+
+
+async def enqueue_scoring_job(typing_log_id, session=None):
+    now = datetime.utcnow()
+    result = await scoring_jobs_collection.insert_one({
+        "typing_log_id": typing_log_id,
+        "status": "pending",
+        "attempts": 0,
+        "available_at": now,
+        "lease_expires_at": None,
+        "worker_id": None,
+        "last_error": None,
+        "created_at": now,
+        "updated_at": now
+    }, session=session)
+    return result.inserted_id
+
+
+async def requeue_orphaned_logs(grace=ORPHAN_GRACE, limit=100):
+    """Enqueue a job for each pending typing log that has none; returns their ids.
+
+    Submissions write the log and its job in one transaction, but a
+    standalone server has none, so a crash between the two writes leaves a
+    log nothing would ever score. Logs younger than ``grace`` seconds are
+    left alone while their submission may still be in flight.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    orphans = typing_logs_collection.aggregate([
+        {"$match": {"status": "pending", "timestamp": {"$lte": cutoff}}},
+        {"$project": {"_id": 1}},
+        {"$lookup": {
+            "from": scoring_jobs_collection.name,
+            "localField": "_id",
+            "foreignField": "typing_log_id",
+            "as": "jobs"
+        }},
+        {"$match": {"jobs": {"$size": 0}}},
+        {"$limit": limit}
+    ])
+    requeued = []
+    async for log in orphans:
+        await enqueue_scoring_job(log["_id"])
+        requeued.append(log["_id"])
+    return requeued
+
+
+async def claim_scoring_job(worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+    now = datetime.utcnow()
+    return await scoring_jobs_collection.find_one_and_update(
+        {"$or": [
+            {"status": "pending", "available_at": {"$lte": now}},
+            {"status": "running", "lease_expires_at": {"$lte": now}}
+        ]},
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "lease_expires_at": now + timedelta(seconds=visibility_timeout),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def extend_scoring_job_lease(job_id, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+    now = datetime.utcnow()
+    result = await scoring_jobs_collection.update_one(
+        {"_id": job_id, "status": "running", "worker_id": worker_id},
+        {"$set": {"lease_expires_at": now + timedelta(seconds=visibility_timeout), "updated_at": now}}
+    )
+    return result.modified_count == 1
+
+
+async def complete_scoring_job(job_id, worker_id):
+    result = await scoring_jobs_collection.update_one(
+        {"_id": job_id, "worker_id": worker_id},
+        {"$set": {"status": "done", "lease_expires_at": None, "updated_at": datetime.utcnow()}}
+    )
+    return result.modified_count == 1
+
+
+async def release_scoring_job(job_id, worker_id, delay=0):
+    """Hand a claimed job back without counting it as a failed attempt."""
+    now = datetime.utcnow()
+    await scoring_jobs_collection.update_one(
+        {"_id": job_id, "worker_id": worker_id},
+        {
+            "$set": {
+                "status": "pending",
+                "available_at": now + timedelta(seconds=delay),
+                "lease_expires_at": None,
+                "updated_at": now
+            },
+            "$inc": {"attempts": -1}
+        }
+    )
+
+
+async def fail_scoring_job(job, error, max_attempts=MAX_ATTEMPTS):
+    """Record a failed attempt; returns True once the job has given up."""
+    now = datetime.utcnow()
+    give_up = job.get("attempts", 0) >= max_attempts
+    update = {
+        "status": "failed" if give_up else "pending",
+        "last_error": str(error),
+        "lease_expires_at": None,
+        "updated_at": now
+    }
+    if not give_up:
+        update["available_at"] = now + timedelta(seconds=RETRY_BACKOFF * 2 ** (job.get("attempts", 1) - 1))
+    await scoring_jobs_collection.update_one(
+        {"_id": job["_id"], "worker_id": job.get("worker_id")},
+        {"$set": update}
+    )
+    return give_up
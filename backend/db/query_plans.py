@@ -0,0 +1,130 @@
+from collections import Counter
+from datetime import datetime
+from typing import NamedTuple, Optional
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from backend.db.dashboard import load_lecturer_dashboard
+from backend.db.db import MONGO_URL, db
+
+# Placeholder values: plans depend on the shape of a filter, not its values.
+_ID = ObjectId()
+_NOW = datetime.utcnow()
+
+
+class PlannedQuery(NamedTuple):
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[dict] = None
+    # Queries that read a whole collection on purpose.
+    expect_collscan: bool = False
+
+
+# One entry per query shape the routers and the scoring worker issue.
+# Lookups by _id always use the _id index and are left out.
+QUERIES = [
+    PlannedQuery("auth.login_student", "students", {"roll_number": "S123"}),
+    PlannedQuery("auth.login_lecturer", "lecturers", {"employee_id": "L456"}),
+    # The dashboard's $lookup stages match on these fields.
+    PlannedQuery("lecturer.dashboard.classes", "classes", {"employee_id": "L456"}),
+    PlannedQuery("lecturer.dashboard.session", "sessions", {"class_id": _ID}),
+    PlannedQuery("lecturer.start_session.sessions", "sessions", {"class_id": _ID}),
+    PlannedQuery("lecturer.class_analytics.students", "students", {"roll_number": {"$in": ["S123"]}}),
+    PlannedQuery("lecturer.manage_class.class", "classes", {"class_id": "CS101"}),
+    PlannedQuery("lecturer.student_search.prefix", "students", {
+        "search_terms": {"$regex": "^ali"}, "roll_number": {"$gt": "S100", "$nin": ["S123"]}
+    }, sort={"roll_number": 1}),
+    PlannedQuery("lecturer.student_search.browse", "students", {
+        "roll_number": {"$gt": "S100", "$nin": ["S123"]}
+    }, sort={"roll_number": 1}),
+    PlannedQuery("lecturer.student_engagement.log", "typing_logs", {"student_id": _ID, "session_id": _ID}),
+    PlannedQuery("student.dashboard.enrolled", "classes", {"class_id": {"$in": ["CS101"]}}),
+    PlannedQuery("student.submit_essay.session", "sessions", {"class_id": _ID}),
+    PlannedQuery("scoring_worker.claim", "scoring_jobs", {"$or": [
+        {"status": "pending", "available_at": {"$lte": _NOW}},
+        {"status": "running", "lease_expires_at": {"$lte": _NOW}}
+    ]}, sort={"available_at": 1}),
+    # requeue_orphaned_logs: the $match, then its $lookup per pending log.
+    PlannedQuery("scoring_worker.orphans", "typing_logs", {"status": "pending", "timestamp": {"$lte": _NOW}}),
+    PlannedQuery("scoring_worker.orphan_jobs", "scoring_jobs", {"typing_log_id": _ID}),
+]
+
+
+def plan_stages(plan):
+    """Every ``stage`` named anywhere in an explain plan."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+async def explain(query, database=db):
+    command = {"find": query.collection, "filter": query.filter}
+    if query.sort:
+        command["sort"] = query.sort
+    result = await database.command({"explain": command, "verbosity": "queryPlanner"})
+    return set(plan_stages(result["queryPlanner"]["winningPlan"]))
+
+
+async def check_query_plans(queries=QUERIES, database=db):
+    """(query, stages, ok) for each query; ok is False for an unexpected COLLSCAN."""
+    results = []
+    for query in queries:
+        stages = await explain(query, database)
+        results.append((query, stages, query.expect_collscan or "COLLSCAN" not in stages))
+    return results
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts the commands a client sends, by command name."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def started(self, event):
+        self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def reset(self):
+        self.counts.clear()
+
+
+async def check_dashboard_query_count(class_counts=(1, 10, 100)):
+    """Commands the lecturer dashboard issues, for lecturers with more and more classes.
+
+    Runs against a scratch database next to the app's, dropped afterwards.
+    Returns ``[(classes, commands), ...]``; every count should be 1.
+    backend.scripts.check_query_plans runs it.
+    """
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(MONGO_URL, event_listeners=[counter])
+    scratch = client[db.name + "_query_count_check"]
+    try:
+        results = []
+        for count in class_counts:
+            await client.drop_database(scratch.name)
+            lecturer = await scratch["lecturers"].insert_one({"employee_id": "L1", "first_name": "Check"})
+            classes = await scratch["classes"].insert_many(
+                [{"class_id": f"C{i}", "subject": "Check", "employee_id": "L1"} for i in range(count)]
+            )
+            await scratch["sessions"].insert_many([{"class_id": cid} for cid in classes.inserted_ids[::2]])
+            counter.reset()
+            await load_lecturer_dashboard(lecturer.inserted_id, scratch)
+            results.append((count, counter.total()))
+        return results
+    finally:
+        await client.drop_database(scratch.name)
+        client.close()
@@ -0,0 +1,125 @@
+import re
+from backend.db.db import (
+    classes_collection, lecturers_collection, session_rollups_collection, sessions_collection,
+    students_collection, typing_logs_collection
+)
+
+# Named, projected queries for the routes. Each projection holds only what
+# its view renders or its route reads, so the large fields (a typing log's
+# raw_log with every keystroke, a session's transcript and its index,
+# password hashes) are only fetched by the queries that need them.
+
+STUDENT_NAME = {"first_name": 1, "last_name": 1, "roll_number": 1}
+STUDENT_PROFILE = {**STUDENT_NAME, "class_ids": 1, "completed_class_ids": 1}
+LOGIN = {"first_name": 1, "password_hash": 1}
+LECTURER_LOGIN = {**LOGIN, "employee_id": 1}
+ID_ONLY = {"_id": 1}
+
+CLASS_SUMMARY = {"class_id": 1, "subject": 1}
+CLASS_ROSTER = {**CLASS_SUMMARY, "student_ids": 1, "sessions": 1}
+
+SESSION_CLASS = {"class_id": 1}
+SESSION_TRANSCRIPT = {"transcript_text": 1}
+SESSION_FOR_SCORING = {"transcript_text": 1, "lecture_features": 1}
+
+# The essay is the only part of raw_log any page shows.
+LOG_DETAIL = {"raw_log.essay_text": 1, "analysis_report": 1, "feedback": 1}
+
+
+# Students
+
+async def student_for_login(roll_number):
+    return await students_collection.find_one({"roll_number": roll_number}, LOGIN)
+
+
+async def roll_number_exists(roll_number):
+    return await students_collection.find_one({"roll_number": roll_number}, ID_ONLY) is not None
+
+
+async def student_by_id(student_id, projection=STUDENT_NAME):
+    return await students_collection.find_one({"_id": student_id}, projection)
+
+
+def students_by_roll_numbers(roll_numbers, projection=STUDENT_NAME):
+    return students_collection.find({"roll_number": {"$in": list(roll_numbers)}}, projection)
+
+
+def student_search_terms(student):
+    """Lowercase keys a student can be found by, stored as ``search_terms``.
+
+    Prefix matches on any of them ("s12", "ali", "student", "alice stu")
+    are anchored regexes over a multikey index.
+    """
+    first = student.get("first_name", "").strip().lower()
+    last = student.get("last_name", "").strip().lower()
+    terms = [student.get("roll_number", "").strip().lower(), first, last, f"{first} {last}".strip()]
+    return sorted({term for term in terms if term})
+
+
+def search_students(prefix="", after=None, exclude_roll_numbers=(), limit=20, projection=STUDENT_NAME):
+    """Students whose roll number or name starts with ``prefix``, by roll number.
+
+    Keyset pagination: pass the last roll number of a page as ``after`` to
+    get the next one. ``exclude_roll_numbers`` (e.g. a class roster) is
+    filtered out by the query itself.
+    """
+    query = {}
+    prefix = prefix.strip().lower()
+    if prefix:
+        query["search_terms"] = {"$regex": "^" + re.escape(prefix)}
+    roll_number = {}
+    if after:
+        roll_number["$gt"] = after
+    if exclude_roll_numbers:
+        roll_number["$nin"] = list(exclude_roll_numbers)
+    if roll_number:
+        query["roll_number"] = roll_number
+    return students_collection.find(query, projection).sort("roll_number", 1).limit(limit)
+
+
+# Lecturers
+
+async def lecturer_for_login(employee_id):
+    return await lecturers_collection.find_one({"employee_id": employee_id}, LECTURER_LOGIN)
+
+
+async def employee_id_exists(employee_id):
+    return await lecturers_collection.find_one({"employee_id": employee_id}, ID_ONLY) is not None
+
+
+# Classes
+
+async def class_by_id(class_oid, projection=CLASS_SUMMARY):
+    return await classes_collection.find_one({"_id": class_oid}, projection)
+
+
+async def class_by_code(class_id, projection=CLASS_SUMMARY):
+    return await classes_collection.find_one({"class_id": class_id}, projection)
+
+
+def classes_by_codes(class_ids, projection=CLASS_SUMMARY):
+    return classes_collection.find({"class_id": {"$in": list(class_ids)}}, projection)
+
+
+def classes_by_ids(class_oids, projection=CLASS_SUMMARY):
+    return classes_collection.find({"_id": {"$in": list(class_oids)}}, projection)
+
+
+# Sessions
+
+async def session_by_id(session_id, projection=SESSION_CLASS):
+    return await sessions_collection.find_one({"_id": session_id}, projection)
+
+
+async def session_for_class(class_oid, projection=ID_ONLY):
+    return await sessions_collection.find_one({"class_id": class_oid}, projection)
+
+
+def session_rollups(session_ids):
+    return session_rollups_collection.find({"_id": {"$in": list(session_ids)}})
+
+
+# Typing logs
+
+async def typing_log_for_student(student_id, session_id, projection=LOG_DETAIL):
+    return await typing_logs_collection.find_one({"student_id": student_id, "session_id": session_id}, projection)
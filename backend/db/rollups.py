@@ -0,0 +1,125 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from pymongo import UpdateOne
+from backend.db.db import session_rollups_collection, sessions_collection, typing_logs_collection
+
+# One small document per session, kept current with $inc as logs are
+# submitted and scored, so class analytics never reads the logs themselves:
+#   {_id: session_id, class_id, submissions, submitted_student_ids,
+#    scored, score_histogram: {"1": n, "0": n, "-1": n},
+#    typing_styles: {label: n}, updated_at}
+# backend.scripts.rebuild_rollups recomputes them from typing_logs.
+
+
+def _style_key(style):
+    return str(style).replace(".", "_").replace("$", "_")
+
+
+async def record_submission(session_id, class_id, student_id, session=None):
+    await session_rollups_collection.update_one(
+        {"_id": session_id},
+        {
+            "$set": {"class_id": class_id, "updated_at": datetime.utcnow()},
+            "$inc": {"submissions": 1},
+            "$addToSet": {"submitted_student_ids": student_id}
+        },
+        upsert=True,
+        session=session
+    )
+
+
+def score_increments(report, previous=None):
+    """$inc for a log scored ``report``, replacing its ``previous`` report if any."""
+    inc = Counter()
+    if previous:
+        inc["scored"] -= 1
+        inc[f"score_histogram.{previous.get('engagement_score')}"] -= 1
+        inc[f"typing_styles.{_style_key(previous.get('typing_style'))}"] -= 1
+    inc["scored"] += 1
+    inc[f"score_histogram.{report.get('engagement_score')}"] += 1
+    inc[f"typing_styles.{_style_key(report.get('typing_style'))}"] += 1
+    return {key: value for key, value in inc.items() if value}
+
+
+async def record_scores(increments_by_session, session=None):
+    """Apply summed score increments, one update per session in a single bulk_write."""
+    now = datetime.utcnow()
+    updates = []
+    for session_id, inc in increments_by_session.items():
+        inc = {key: value for key, value in inc.items() if value}
+        if inc:
+            updates.append(UpdateOne({"_id": session_id}, {"$inc": inc, "$set": {"updated_at": now}}, upsert=True))
+    if updates:
+        await session_rollups_collection.bulk_write(updates, ordered=False, session=session)
+
+
+async def record_score(session_id, report, previous=None, session=None):
+    await record_scores({session_id: score_increments(report, previous)}, session=session)
+
+
+def summarize_rollups(rollups):
+    """Class-level totals across a class's session rollups."""
+    histogram = Counter()
+    styles = Counter()
+    submitted = set()
+    submissions = 0
+    for rollup in rollups:
+        histogram.update(rollup.get("score_histogram", {}))
+        styles.update(rollup.get("typing_styles", {}))
+        submitted.update(rollup.get("submitted_student_ids", []))
+        submissions += rollup.get("submissions", 0)
+    return {
+        "submissions": submissions,
+        "submitted_student_ids": submitted,
+        "score_histogram": {k: v for k, v in histogram.items() if v},
+        "typing_styles": {k: v for k, v in styles.items() if v},
+    }
+
+
+async def rebuild_rollups(session_ids=None):
+    """Recompute rollups from typing_logs; returns the number of sessions written.
+
+    With ``session_ids`` only those sessions are rebuilt; otherwise every
+    rollup is replaced and rollups of sessions without logs are removed.
+    """
+    query = {"session_id": {"$in": list(session_ids)}} if session_ids is not None else {}
+    rollups = defaultdict(lambda: {
+        "submissions": 0, "submitted_student_ids": set(), "scored": 0,
+        "score_histogram": Counter(), "typing_styles": Counter()
+    })
+    cursor = typing_logs_collection.find(query, {
+        "session_id": 1, "student_id": 1, "status": 1,
+        "analysis_report.engagement_score": 1, "analysis_report.typing_style": 1
+    })
+    async for log in cursor:
+        rollup = rollups[log["session_id"]]
+        rollup["submissions"] += 1
+        rollup["submitted_student_ids"].add(log["student_id"])
+        report = log.get("analysis_report")
+        # Logs from before the queue have a report but no status.
+        if report and log.get("status", "completed") == "completed":
+            rollup["scored"] += 1
+            rollup["score_histogram"][str(report.get("engagement_score"))] += 1
+            rollup["typing_styles"][_style_key(report.get("typing_style"))] += 1
+
+    class_ids = {
+        s["_id"]: s.get("class_id")
+        async for s in sessions_collection.find({"_id": {"$in": list(rollups)}}, {"class_id": 1})
+    }
+    now = datetime.utcnow()
+    for session_id, rollup in rollups.items():
+        await session_rollups_collection.replace_one({"_id": session_id}, {
+            "class_id": class_ids.get(session_id),
+            "submissions": rollup["submissions"],
+            "submitted_student_ids": sorted(rollup["submitted_student_ids"]),
+            "scored": rollup["scored"],
+            "score_histogram": dict(rollup["score_histogram"]),
+            "typing_styles": dict(rollup["typing_styles"]),
+            "updated_at": now
+        }, upsert=True)
+
+    stale = {"_id": {"$nin": list(rollups)}}
+    if session_ids is not None:
+        stale["_id"]["$in"] = list(session_ids)
+    await session_rollups_collection.delete_many(stale)
+    return len(rollups)
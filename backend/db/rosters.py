@@ -0,0 +1,66 @@
+from pymongo import UpdateMany, UpdateOne
+from backend.db.db import classes_collection, lecturers_collection, students_collection
+from backend.db.transactions import run_in_transaction
+
+# Roster changes touch classes.student_ids and students.class_ids together,
+# so they go through run_in_transaction.
+
+
+async def _apply(class_id, add_roll_numbers, remove_roll_numbers, session):
+    # Added first, then removed, so a roll number in both ends up removed.
+    class_updates = []
+    student_updates = []
+    if add_roll_numbers:
+        class_updates.append(UpdateOne(
+            {"class_id": class_id}, {"$addToSet": {"student_ids": {"$each": add_roll_numbers}}}
+        ))
+        student_updates.append(UpdateMany(
+            {"roll_number": {"$in": add_roll_numbers}}, {"$addToSet": {"class_ids": class_id}}
+        ))
+    if remove_roll_numbers:
+        class_updates.append(UpdateOne(
+            {"class_id": class_id}, {"$pull": {"student_ids": {"$in": remove_roll_numbers}}}
+        ))
+        student_updates.append(UpdateMany(
+            {"roll_number": {"$in": remove_roll_numbers}}, {"$pull": {"class_ids": class_id}}
+        ))
+    if class_updates:
+        await classes_collection.bulk_write(class_updates, session=session)
+        await students_collection.bulk_write(student_updates, session=session)
+
+
+async def update_roster(class_id, add_roll_numbers=(), remove_roll_numbers=()):
+    """Enrol and unenrol students in two batched writes, whatever the roster size."""
+    add_roll_numbers = list(dict.fromkeys(add_roll_numbers))
+    remove_roll_numbers = list(dict.fromkeys(remove_roll_numbers))
+    await run_in_transaction(lambda session: _apply(class_id, add_roll_numbers, remove_roll_numbers, session))
+
+
+async def create_class(class_doc):
+    """Insert a class, enrol its students and count it for its lecturer, together."""
+    roll_numbers = list(dict.fromkeys(class_doc["student_ids"]))
+
+    async def operation(session):
+        result = await classes_collection.insert_one(class_doc, session=session)
+        if roll_numbers:
+            await students_collection.update_many(
+                {"roll_number": {"$in": roll_numbers}},
+                {"$addToSet": {"class_ids": class_doc["class_id"]}},
+                session=session
+            )
+        await lecturers_collection.update_one(
+            {"employee_id": class_doc["employee_id"]},
+            {
+                "$addToSet": {"current_class_ids": class_doc["class_id"]},
+                "$inc": {"total_classes_taught": 1}
+            },
+            session=session
+        )
+        return result.inserted_id
+
+    return await run_in_transaction(operation)
+
+
+async def existing_roll_numbers(roll_numbers):
+    cursor = students_collection.find({"roll_number": {"$in": list(roll_numbers)}}, {"roll_number": 1, "_id": 0})
+    return {doc["roll_number"] async for doc in cursor}
@@ -0,0 +1,36 @@
+import logging
+from pymongo.errors import OperationFailure
+from backend.db.db import client
+
+logger = logging.getLogger(__name__)
+
+# Writes that must land together (a roster change on both sides, a typing
+# log and its scoring job) run in a transaction where the deployment
+# supports one (replica set or mongos); a standalone server runs the same
+# writes without it.
+
+_transactions_supported = None
+
+
+async def run_in_transaction(operation):
+    """Await ``operation(session)`` inside a transaction, or with session=None if unsupported."""
+    global _transactions_supported
+    if _transactions_supported is not False:
+        async with await client.start_session() as session:
+            try:
+                # with_transaction retries the whole operation on
+                # TransientTransactionError (e.g. a write conflict with a
+                # concurrent stream append) and the commit on
+                # UnknownTransactionCommitResult, so ``operation`` must be
+                # safe to run again.
+                result = await session.with_transaction(operation)
+                _transactions_supported = True
+                return result
+            except OperationFailure as e:
+                # IllegalOperation: "Transaction numbers are only allowed on a
+                # replica set member or mongos".
+                if e.code != 20 or _transactions_supported:
+                    raise
+                logger.warning("MongoDB does not support transactions; multi-document writes are not atomic")
+                _transactions_supported = False
+    return await operation(None)
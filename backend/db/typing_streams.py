@@ -0,0 +1,123 @@
+import math
+import os
+from datetime import datetime
+from backend.db.db import typing_streams_collection
+from backend.services.typing_metrics.incremental import TypingAggregate
+
+# One document per in-progress typing test. Word events arrive in numbered
+# chunks; each chunk is folded into the running aggregate and appended to
+# the stored words with a compare-and-set on next_seq, so retries and
+# out-of-order chunks can't double count.
+
+# Words are stored on the stream document, which must stay well under
+# MongoDB's 16 MB limit; a word event is a few hundred bytes.
+MAX_CHUNK_WORDS = int(os.getenv("TYPING_STREAM_MAX_CHUNK_WORDS", "500"))
+MAX_STREAM_WORDS = int(os.getenv("TYPING_STREAM_MAX_WORDS", "20000"))
+
+
+class StreamConflict(Exception):
+    def __init__(self, expected_seq):
+        super().__init__(f"Expected chunk {expected_seq}")
+        self.expected_seq = expected_seq
+
+
+class StreamFinalized(Exception):
+    pass
+
+
+class StreamTooLarge(Exception):
+    pass
+
+
+class InvalidWordEvent(ValueError):
+    pass
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate_word_events(words):
+    """Raise InvalidWordEvent unless every event has the fields scoring reads."""
+    for i, w in enumerate(words):
+        if not isinstance(w, dict):
+            raise InvalidWordEvent(f"word {i}: expected an object")
+        if not isinstance(w.get("word"), str):
+            raise InvalidWordEvent(f"word {i}: 'word' must be a string")
+        backspaces = w.get("backspaces")
+        if not isinstance(backspaces, int) or isinstance(backspaces, bool) or backspaces < 0:
+            raise InvalidWordEvent(f"word {i}: 'backspaces' must be a non-negative integer")
+        for field in ("duration", "pause_before", "start_time", "end_time"):
+            if w.get(field) is not None and not _is_number(w[field]):
+                raise InvalidWordEvent(f"word {i}: '{field}' must be a number or null")
+
+
+async def create_typing_stream(student_id, session_id):
+    now = datetime.utcnow()
+    result = await typing_streams_collection.insert_one({
+        "student_id": student_id,
+        "session_id": session_id,
+        "state": TypingAggregate().to_dict(),
+        "words": [],
+        "next_seq": 0,
+        "finalized": False,
+        "created_at": now,
+        "updated_at": now
+    })
+    return result.inserted_id
+
+
+async def get_typing_stream(stream_id, student_id, projection=None):
+    return await typing_streams_collection.find_one(
+        {"_id": stream_id, "student_id": student_id},
+        projection
+    )
+
+
+async def append_typing_events(stream, seq, words):
+    """Fold one chunk into the stream; returns the next expected seq.
+
+    Raises InvalidWordEvent or StreamTooLarge before anything is written.
+    """
+    if seq < stream["next_seq"]:
+        return stream["next_seq"]  # Already applied; the client is retrying.
+    if seq > stream["next_seq"] or stream.get("finalized"):
+        raise StreamConflict(stream["next_seq"])
+    if len(words) > MAX_CHUNK_WORDS:
+        raise StreamTooLarge(f"At most {MAX_CHUNK_WORDS} words per chunk")
+    if stream["state"].get("words", 0) + len(words) > MAX_STREAM_WORDS:
+        raise StreamTooLarge(f"At most {MAX_STREAM_WORDS} words per typing test")
+    validate_word_events(words)
+
+    state = TypingAggregate.from_dict(stream["state"]).update(words).to_dict()
+    result = await typing_streams_collection.update_one(
+        {"_id": stream["_id"], "next_seq": seq, "finalized": False},
+        {
+            "$set": {"state": state, "updated_at": datetime.utcnow()},
+            "$push": {"words": {"$each": words}},
+            "$inc": {"next_seq": 1}
+        }
+    )
+    if result.modified_count == 0:
+        raise StreamConflict(stream["next_seq"])
+    return seq + 1
+
+
+async def finalize_typing_stream(stream, session=None):
+    """Close the stream at the state it was read in, exactly once.
+
+    Raises StreamFinalized if it was already closed, or StreamConflict if a
+    chunk landed since ``stream`` was read.
+    """
+    result = await typing_streams_collection.update_one(
+        {"_id": stream["_id"], "next_seq": stream["next_seq"], "finalized": False},
+        {"$set": {"finalized": True, "updated_at": datetime.utcnow()}},
+        session=session
+    )
+    if result.modified_count == 0:
+        current = await typing_streams_collection.find_one(
+            {"_id": stream["_id"]}, {"next_seq": 1, "finalized": 1}, session=session
+        )
+        if not current or current.get("finalized"):
+            raise StreamFinalized("Typing stream already submitted")
+        raise StreamConflict(current["next_seq"])
@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+from pymongo import UpdateOne
+from backend.db.db import students_collection
+from backend.db.repository import student_search_terms
+
+# Usage: python -m backend.scripts.backfill_search_terms [--all]
+# Fills in search_terms for students created before the typeahead existed.
+# --all recomputes it for everyone, e.g. after the term rules change.
+
+BATCH_SIZE = 500
+
+
+async def backfill(recompute_all=False):
+    query = {} if recompute_all else {"search_terms": {"$exists": False}}
+    cursor = students_collection.find(query, {"roll_number": 1, "first_name": 1, "last_name": 1})
+    updates = []
+    updated = 0
+    async for student in cursor:
+        updates.append(UpdateOne({"_id": student["_id"]}, {"$set": {"search_terms": student_search_terms(student)}}))
+        if len(updates) >= BATCH_SIZE:
+            await students_collection.bulk_write(updates, ordered=False)
+            updated += len(updates)
+            updates = []
+    if updates:
+        await students_collection.bulk_write(updates, ordered=False)
+        updated += len(updates)
+    print(f"Updated search_terms for {updated} student(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill students.search_terms for the student typeahead.")
+    parser.add_argument("--all", action="store_true", help="recompute for every student")
+    asyncio.run(backfill(parser.parse_args().all))
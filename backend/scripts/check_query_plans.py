@@ -0,0 +1,29 @@
+import asyncio
+import sys
+from backend.db.query_plans import check_dashboard_query_count, check_query_plans
+
+# Usage: python -m backend.scripts.check_query_plans
+# Explains every query in backend/db/query_plans.py against the configured
+# database and fails if any of them scans a whole collection. Also checks
+# that the lecturer dashboard stays at one command as classes are added.
+# Run backend.scripts.ensure_indexes first on a fresh database.
+#
+# Nothing runs this automatically: it needs a live MongoDB, and the repo
+# has no test suite to hang it on. Run it by hand after changing a query,
+# or add it as a CI step with a MongoDB service.
+
+
+async def main():
+    failed = False
+    for query, stages, ok in await check_query_plans():
+        failed = failed or not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {query.name}: {', '.join(sorted(stages))}")
+    for classes, commands in await check_dashboard_query_count():
+        ok = commands == 1
+        failed = failed or not ok
+        print(f"{'ok  ' if ok else 'FAIL'} lecturer.dashboard with {classes} classes: {commands} command(s)")
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
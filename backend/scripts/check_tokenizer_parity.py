@@ -0,0 +1,89 @@
+import argparse
+import sys
+import nltk
+from nltk.tokenize import word_tokenize
+from backend.services.typing_metrics.session import TypingSession
+from backend.services.typing_metrics.tokenization import compare_backends, split_words_fast
+
+# Usage: python -m backend.scripts.check_tokenizer_parity [typing_log.json ...]
+# Fails when the fast tokenizer's stylometry features drift from NLTK's by
+# more than --tolerance (relative) on any of the given typing logs or the
+# sample essays below, or when its word splitter differs from Treebank's
+# on any of the sample sentences.
+
+DEFAULT_LOGS = ["backend/services/typing_metrics/typing_log_20250617_155418.json"]
+
+# Abbreviations, quotes, contractions, numbers and ellipses: the cases the
+# regex backend has to special-case to match Treebank token for token.
+SAMPLE_SENTENCES = [
+    "He moved to the U.S. in 2010.",
+    "\"It was hard,\" he said.",
+    "Dr. Smith didn't agree... Really?!",
+    "(Yes.) The e.g. case, i.e. this one.",
+    "It costs $3.50 (approx.) today.",
+    "She said 'no' and we'll see, won't we?",
+    "The well-known 3,000-mile trip (see Fig. 2) was long.",
+    "Mr. and Mrs. Smith arrived at 5 p.m. yesterday.",
+    "Results: 95% accuracy; recall was 0.9.",
+]
+
+SAMPLE_ESSAYS = [
+    "The lecture covered gradient descent. Dr. Rao showed how the step size matters: too large and "
+    "it diverges, too small and it crawls. I didn't expect momentum to help this much!",
+    "\"Overfitting\" was the key word today. We saw a model with 99.5% training accuracy fail on new "
+    "data. The fix, e.g. regularization or more data, depends on the problem. Makes sense.",
+    "In the U.S. most grids run at 60 Hz, while Europe uses 50 Hz. Why the difference? History, "
+    "mostly... and it's too costly to change now. The prof. said it's a classic lock-in story.",
+    "I wasn't sure about recursion at first. Then we traced factorial(3) by hand: 3 * 2 * 1 = 6. "
+    "Base case first, then the recursive step. It finally clicked!",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare stylometry features across tokenizer backends.")
+    parser.add_argument("logs", nargs="*", default=DEFAULT_LOGS)
+    parser.add_argument("--backend", default="fast")
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    parser.add_argument("--download", action="store_true", help="fetch NLTK's Punkt data if it is missing")
+    return parser.parse_args()
+
+
+def check_sentences():
+    failed = False
+    for sentence in SAMPLE_SENTENCES:
+        expected = word_tokenize(sentence, preserve_line=True)
+        actual = split_words_fast(sentence)
+        ok = actual == expected
+        failed = failed or not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {sentence!r}" + ("" if ok else f"\n     nltk: {expected}\n     fast: {actual}"))
+    return failed
+
+
+def require_punkt(download):
+    # The word checks only need Treebank; the essays go through Punkt.
+    try:
+        nltk.data.find("tokenizers/punkt_tab/english/")
+    except LookupError:
+        if not (download and nltk.download("punkt_tab", quiet=True)):
+            sys.exit("NLTK's Punkt data (punkt_tab) is not installed, so the essay comparison can't run. "
+                     "Install it with --download or `python -m nltk.downloader punkt_tab`.")
+
+
+def check_texts(args):
+    failed = False
+    texts = [(path, TypingSession.from_file(path).text) for path in args.logs]
+    texts += [(f"sample essay {i + 1}", essay) for i, essay in enumerate(SAMPLE_ESSAYS)]
+    for name, text in texts:
+        diffs = compare_backends(text, backend=args.backend)
+        worst = max(diffs, key=diffs.get)
+        ok = diffs[worst] <= args.tolerance
+        failed = failed or not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: worst {worst} differs by {diffs[worst]:.2%}")
+    return failed
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    failed = check_sentences()
+    require_punkt(args.download)
+    failed = check_texts(args) or failed
+    sys.exit(1 if failed else 0)
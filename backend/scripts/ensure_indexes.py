@@ -0,0 +1,22 @@
+import asyncio
+import logging
+from backend.db.indexes import IndexBuildError, ensure_indexes
+
+# Usage: python -m backend.scripts.ensure_indexes
+# Applies backend/db/indexes.py. The app does the same at startup unless
+# MONGO_ENSURE_INDEXES=0; run this before deploying when a new unique index
+# might fail on existing duplicates.
+
+
+def main():
+    try:
+        asyncio.run(ensure_indexes())
+    except IndexBuildError as e:
+        raise SystemExit("Could not create indexes:\n" + "\n".join(
+            f"  {collection}.{name}: {error}" for collection, name, error in e.failures
+        ))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main()
@@ -0,0 +1,27 @@
+import argparse
+from optimum.intel import OVModelForSeq2SeqLM
+from transformers import AutoTokenizer
+from backend.services.question_answering import QA_GENERATOR_PATH, QA_MODEL_NAME
+
+# Usage: python -m backend.scripts.export_flan_t5 [--output DIR]
+# Exports flan-t5 to OpenVINO IR (encoder, decoder and decoder-with-past)
+# next to the other models; commit the result (the .bin files go through
+# LFS). The QA generator refuses to load without it unless
+# QA_PYTORCH_FALLBACK=1. Its compiled blobs go to OV_CACHE_DIR on first load.
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export flan-t5 to OpenVINO IR.")
+    parser.add_argument("--model", default=QA_MODEL_NAME)
+    parser.add_argument("--output", default=QA_GENERATOR_PATH)
+    return parser.parse_args()
+
+
+def main(args):
+    model = OVModelForSeq2SeqLM.from_pretrained(args.model, export=True, compile=False)
+    model.save_pretrained(args.output)
+    AutoTokenizer.from_pretrained(args.model).save_pretrained(args.output)
+    print(f"Exported {args.model} to {args.output}")
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,53 @@
+import argparse
+import logging
+import os
+import sys
+from backend.services import model_registry
+from backend.services.question_answering import QA_GENERATOR_XML
+
+# Usage: python -m backend.scripts.prewarm_models [--cache-dir DIR] [--device CPU]
+# Run at deploy time (same image, same OV_CACHE_DIR and OV_DEVICE as the app)
+# so every process that starts afterwards loads compiled blobs from the cache
+# instead of compiling the OpenVINO graphs itself. It also removes cache
+# directories left by earlier versions of each model once they are older
+# than --prune-age, i.e. no longer in use by a running process.
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compile the OpenVINO models into the blob cache.")
+    parser.add_argument("--cache-dir", default=model_registry.CACHE_DIR)
+    parser.add_argument("--device", default=model_registry.DEVICE)
+    parser.add_argument("--prune-age", type=int, default=model_registry.CACHE_PRUNE_AGE,
+                        help="remove other cache directories of each model untouched for this many seconds")
+    return parser.parse_args()
+
+
+def main(args):
+    if not args.cache_dir:
+        sys.exit("OV_CACHE_DIR is empty, so there is no cache to populate")
+    model_registry.CACHE_DIR = args.cache_dir
+
+    # Fail the deploy here rather than serve QA without its model.
+    if not os.path.exists(QA_GENERATOR_XML):
+        sys.exit(f"{QA_GENERATOR_XML} not found: run backend.scripts.export_flan_t5 or `git lfs pull`")
+
+    models = [
+        (model_registry.MINILM_MODEL_PATH, model_registry.MINILM_TOKENIZER),
+        (model_registry.CROSS_MODEL_PATH, model_registry.CROSS_TOKENIZER),
+    ]
+    for model_path, tokenizer_name in models:
+        print(f"{model_path} -> {model_registry.model_cache_dir(model_path)}")
+        model = model_registry.get_model(model_path, args.device)
+        model(model_registry.get_tokenizer(tokenizer_name)("warm up", return_tensors="np"))
+        for stale in model_registry.prune_model_caches(model_path, args.cache_dir, args.prune_age):
+            print(f"  removed {stale}")
+
+    model_registry.DEVICE = args.device
+    print(f"{QA_GENERATOR_XML} -> {model_registry.model_cache_dir(QA_GENERATOR_XML)}")
+    model_registry.get("qa_generator")
+    for stale in model_registry.prune_model_caches(QA_GENERATOR_XML, args.cache_dir, args.prune_age):
+        print(f"  removed {stale}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main(parse_args())
@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+from bson import ObjectId
+from backend.db.db import classes_collection
+from backend.db.rollups import rebuild_rollups
+
+# Usage:
+#   python -m backend.scripts.rebuild_rollups
+#   python -m backend.scripts.rebuild_rollups --class-id CS101
+#   python -m backend.scripts.rebuild_rollups --session-id <id>
+#
+# Recomputes session_rollups from typing_logs, e.g. after a manual fix to
+# the logs or if the counters ever drift.
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild per-session engagement rollups.")
+    parser.add_argument("--class-id", help="class_id (e.g. CS101) or class _id")
+    parser.add_argument("--session-id")
+    return parser.parse_args()
+
+
+async def main(args):
+    session_ids = None
+    if args.class_id:
+        class_query = {"_id": ObjectId(args.class_id)} if ObjectId.is_valid(args.class_id) else {"class_id": args.class_id}
+        class_doc = await classes_collection.find_one(class_query, {"sessions": 1})
+        if not class_doc:
+            raise SystemExit(f"Class {args.class_id} not found")
+        session_ids = class_doc.get("sessions", [])
+    if args.session_id:
+        session_ids = [ObjectId(args.session_id)]
+    print(f"Rebuilt rollups for {await rebuild_rollups(session_ids)} session(s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from backend.db.db import classes_collection, sessions_collection, typing_logs_collection
+from backend.db.rollups import record_scores, score_increments
+
+# Usage:
+#   python -m backend.scripts.rescore_logs --class-id CS101
+#   python -m backend.scripts.rescore_logs --session-id <id> --workers 4
+#   python -m backend.scripts.rescore_logs --since 2025-06-01 --until 2025-07-01
+#
+# Re-scores stored typing logs from their raw_log after the model or the
+# thresholds change. Logs are streamed in _id order and scored in chunks on
+# a process pool; the highest _id below which every chunk has been written
+# is checkpointed, so re-running the same command resumes where it stopped.
+
+
+def _score_chunk(essay_docs):
+    # Imported in the worker so the parent never loads (or forks) the models.
+    from backend.services.engagement_engine import score_essay, score_essays
+    try:
+        return [(report, None) for report in score_essays(essay_docs)]
+    except Exception:
+        results = []
+        for doc in essay_docs:
+            try:
+                results.append((score_essay(doc), None))
+            except Exception as e:
+                results.append((None, str(e)))
+        return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Re-score stored typing logs.")
+    parser.add_argument("--class-id", help="class_id (e.g. CS101) or class _id")
+    parser.add_argument("--session-id")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only logs submitted at or after this time")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="only logs submitted before this time")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--checkpoint", default=".rescore_checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    return parser.parse_args()
+
+
+async def build_filter(args):
+    query = {}
+    if args.class_id:
+        class_query = {"_id": ObjectId(args.class_id)} if ObjectId.is_valid(args.class_id) else {"class_id": args.class_id}
+        class_doc = await classes_collection.find_one(class_query, {"sessions": 1})
+        if not class_doc:
+            raise SystemExit(f"Class {args.class_id} not found")
+        query["session_id"] = {"$in": class_doc.get("sessions", [])}
+    if args.session_id:
+        query["session_id"] = ObjectId(args.session_id)
+    if args.since or args.until:
+        query["timestamp"] = {}
+        if args.since:
+            query["timestamp"]["$gte"] = args.since
+        if args.until:
+            query["timestamp"]["$lt"] = args.until
+    return query
+
+
+def load_checkpoint(path, filter_key):
+    if not os.path.exists(path):
+        return None, 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("filter") != filter_key:
+        raise SystemExit(f"{path} belongs to a different run; pass --restart or another --checkpoint")
+    return ObjectId(checkpoint["last_id"]), checkpoint["processed"]
+
+
+def save_checkpoint(path, filter_key, last_id, processed):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"filter": filter_key, "last_id": str(last_id), "processed": processed}, f)
+    os.replace(tmp_path, path)
+
+
+async def lecture_for(session_id, cache):
+    if session_id not in cache:
+        session = await sessions_collection.find_one(
+            {"_id": session_id}, {"transcript_text": 1, "lecture_features": 1}
+        ) or {}
+        cache[session_id] = (session.get("transcript_text", ""), session.get("lecture_features"))
+    return cache[session_id]
+
+
+async def write_results(logs, results):
+    now = datetime.utcnow()
+    updates = []
+    rollup_increments = {}
+    failures = 0
+    for log, (report, error) in zip(logs, results):
+        if error is not None:
+            failures += 1
+            print(f"  failed {log['_id']}: {error}")
+            continue
+        updates.append(UpdateOne(
+            {"_id": log["_id"]},
+            {"$set": {"analysis_report": report, "status": "completed", "rescored_at": now}}
+        ))
+        # Move the log's old score out of the session rollup and the new one in.
+        previous = log.get("analysis_report") if log.get("status", "completed") == "completed" else None
+        inc = rollup_increments.setdefault(log["session_id"], {})
+        for key, value in score_increments(report, previous).items():
+            inc[key] = inc.get(key, 0) + value
+    if updates:
+        await typing_logs_collection.bulk_write(updates, ordered=False)
+        await record_scores(rollup_increments)
+    return failures
+
+
+async def rescore(args):
+    query = await build_filter(args)
+    filter_key = json.dumps(
+        {k: getattr(args, k) for k in ("class_id", "session_id", "since", "until")}, default=str, sort_keys=True
+    )
+    last_id, processed = (None, 0) if args.restart else load_checkpoint(args.checkpoint, filter_key)
+    if last_id is not None:
+        query["_id"] = {"$gt": last_id}
+        print(f"Resuming after {last_id} ({processed} already processed)")
+
+    loop = asyncio.get_running_loop()
+    lectures = {}
+    in_flight = []  # (last _id of chunk, logs, future) in cursor order
+    failures = 0
+
+    async def drain(limit):
+        nonlocal processed, failures
+        while len(in_flight) > limit:
+            chunk_last_id, logs, future = in_flight.pop(0)
+            failures += await write_results(logs, await future)
+            processed += len(logs)
+            save_checkpoint(args.checkpoint, filter_key, chunk_last_id, processed)
+            print(f"{processed} logs re-scored")
+
+    cursor = typing_logs_collection.find(
+        query,
+        {
+            "raw_log": 1, "session_id": 1, "typing_metrics": 1, "status": 1,
+            "analysis_report.engagement_score": 1, "analysis_report.typing_style": 1
+        }
+    ).sort("_id", 1).batch_size(args.chunk_size * args.workers)
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+        logs = []
+        async for log in cursor:
+            logs.append(log)
+            if len(logs) < args.chunk_size:
+                continue
+            in_flight.append((logs[-1]["_id"], logs, await submit(loop, pool, logs, lectures)))
+            logs = []
+            await drain(args.workers * 2)
+        if logs:
+            in_flight.append((logs[-1]["_id"], logs, await submit(loop, pool, logs, lectures)))
+        await drain(0)
+
+    print(f"Done: {processed} processed, {failures} failed")
+
+
+async def submit(loop, pool, logs, lectures):
+    essay_docs = []
+    for log in logs:
+        lecture_text, lecture_features = await lecture_for(log["session_id"], lectures)
+        raw_log = log.get("raw_log", {})
+        essay_docs.append({
+            "essay_text": raw_log.get("essay_text", ""),
+            "typing_data": raw_log.get("typing_data", {}),
+            "lecture_text": lecture_text,
+            "lecture_features": lecture_features,
+            "typing_metrics": log.get("typing_metrics")
+        })
+    return loop.run_in_executor(pool, _score_chunk, essay_docs)
+
+
+if __name__ == "__main__":
+    asyncio.run(rescore(parse_args()))
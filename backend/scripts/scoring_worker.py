@@ -0,0 +1,28 @@
+import time
+PROCESS_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+import signal
+from backend.services import model_registry
+from backend.services.engagement_engine import SCORING_MODELS
+from backend.services.scoring_worker import run_worker
+
+# Usage: python -m backend.scripts.scoring_worker
+# Run as many of these as needed; jobs are claimed atomically from Mongo.
+
+async def main():
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+    # Load everything before claiming jobs so leases aren't spent on warm-up.
+    await asyncio.to_thread(model_registry.warm_up, SCORING_MODELS)
+    await run_worker(stop_event=stop_event)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+model_registry.mark_process_start(PROCESS_STARTED)
+asyncio.run(main())
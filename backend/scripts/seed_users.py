@@ -1,5 +1,6 @@
 import asyncio
 from backend.db.db import students_collection, lecturers_collection
+from backend.db.repository import student_search_terms
 from passlib.context import CryptContext
 
 pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -8,7 +9,7 @@ async def seed():
     await students_collection.delete_many({})
     await lecturers_collection.delete_many({})
 
-    await students_collection.insert_one({
+    student = {
         "roll_number": "S123",
         "first_name": "Alice",
         "last_name": "Student",
@@ -17,7 +18,9 @@ async def seed():
         "password_hash": pwd.hash("student123"),
         "class_ids": [],
         "completed_class_ids": []
-    })
+    }
+    student["search_terms"] = student_search_terms(student)
+    await students_collection.insert_one(student)
 
     await lecturers_collection.insert_one({
         "employee_id": "L456",
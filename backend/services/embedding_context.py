@@ -0,0 +1,59 @@
+import numpy as np
+from backend.services.inference_batcher import embedding_batcher
+
+
+class EssayEmbeddingContext:
+    """MiniLM embeddings for every span of one essay, computed in one pass.
+
+    Consumers register named groups of spans up front (the document, its
+    topic candidates, the stylometry drift chunks). The first lookup embeds
+    all registered spans together, each distinct string once, and every
+    later lookup reads from that result.
+    """
+
+    def __init__(self):
+        self._groups = {}
+        self._embedded = None
+        self._index = None
+
+    def add(self, group, texts):
+        if self._embedded is not None:
+            raise RuntimeError("Spans must be added before the first lookup")
+        self._groups[group] = list(texts)
+        return self
+
+    def __contains__(self, group):
+        return group in self._groups
+
+    def texts(self, group):
+        return self._groups.get(group, [])
+
+    def _embed_all(self):
+        if self._embedded is None:
+            unique = list(dict.fromkeys(t for texts in self._groups.values() for t in texts))
+            self._index = {text: i for i, text in enumerate(unique)}
+            raw = np.stack(embedding_batcher.map(unique)) if unique else np.zeros((0, 0), dtype=np.float32)
+            norms = np.linalg.norm(raw, axis=1, keepdims=True) if unique else np.ones((0, 1))
+            norms[norms == 0] = 1e-10
+            self._embedded = (raw, raw / norms)
+        return self._embedded
+
+    def _rows(self, group, normalized):
+        matrix = self._embed_all()[1 if normalized else 0]
+        return matrix[[self._index[t] for t in self.texts(group)]]
+
+    def embeddings(self, group):
+        return self._rows(group, normalized=False)
+
+    def normalized(self, group):
+        return self._rows(group, normalized=True)
+
+    def similarities(self, group, target):
+        """Cosine similarity of every span in ``group`` to one vector."""
+        target = np.asarray(target, dtype=np.float32)
+        return self.normalized(group) @ (target / (np.linalg.norm(target) or 1e-10))
+
+    def adjacent_similarities(self, group):
+        """Cosine similarity between each span and the next, vectorized."""
+        emb = self.normalized(group)
+        return np.einsum("ij,ij->i", emb[:-1], emb[1:])
@@ -1,26 +1,36 @@
+import hashlib
 import os
 import pickle
 import re
+import threading
+import warnings
+from collections import Counter, OrderedDict
 import numpy as np
-import pandas as pd
-from transformers import AutoTokenizer
-from openvino.runtime import Core
-from backend.services.typing_metrics.pipeline import analyze_typing_data_dict
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from backend.services.embedding_context import EssayEmbeddingContext
+from backend.services.inference_batcher import embedding_batcher, cross_batcher
+from backend.services import model_registry
+from backend.services.scoring_pool import scoring_pool
+from backend.services.typing_metrics.pipeline import analyze_typing_session
+from backend.services.typing_metrics.session import TypingSession
+from backend.services.typing_metrics.stylometry import drift_chunks
 
 
-minilm_tokenizer = AutoTokenizer.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
-cross_tokenizer = AutoTokenizer.from_pretrained("cross-encoder/stsb-roberta-base")
+LECTURE_CACHE_SIZE = int(os.getenv("LECTURE_CACHE_SIZE", "32"))
+MAX_TOPIC_CANDIDATES = int(os.getenv("MAX_TOPIC_CANDIDATES", "256"))
+EMBED_CHUNK_SIZE = int(os.getenv("EMBED_CHUNK_SIZE", "64"))
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9'-]*")
 
-core = Core()
-KW_MODEL_PATH = os.path.join("backend","services","models","openvino_minilm", "model.xml")
-kw_model = core.compile_model(KW_MODEL_PATH, "CPU")
-kw_input_names = [inp.get_any_name() for inp in kw_model.inputs]
-kw_output = kw_model.output(0)
-
-CROSS_MODEL_PATH = os.path.join("backend","services","models","openvino_cross", "model.xml")
-cross_model = core.compile_model(CROSS_MODEL_PATH, "CPU")
-cross_input_names = [inp.get_any_name() for inp in cross_model.inputs]
-cross_output = cross_model.output(0)
+# "windowed" scores the essay against overlapping lecture windows so long
+# transcripts aren't cut at 512 tokens; "truncate" is the old single pair.
+CROSS_SCORING_MODE = os.getenv("CROSS_SCORING_MODE", "windowed")
+CROSS_WINDOW_TOKENS = int(os.getenv("CROSS_WINDOW_TOKENS", "256"))
+CROSS_WINDOW_STRIDE = int(os.getenv("CROSS_WINDOW_STRIDE", "192"))
+CROSS_MAX_WINDOWS = int(os.getenv("CROSS_MAX_WINDOWS", "16"))
+CROSS_AGGREGATION = os.getenv("CROSS_AGGREGATION", "max")
+CROSS_AGGREGATION_TOP_K = int(os.getenv("CROSS_AGGREGATION_TOP_K", "3"))
+_lecture_cache = OrderedDict()
+_lecture_cache_lock = threading.Lock()
 
 def preprocess(text):
     text = text.lower()
@@ -28,97 +38,268 @@ def preprocess(text):
     return text.strip()
 
 def embed_text_ov(text_list):
-    tokens = minilm_tokenizer(text_list, padding=True, truncation=True, return_tensors="np")
-    inputs = {name: tokens[name].astype(np.int64) for name in kw_input_names if name in tokens}
-    output = kw_model(inputs)[kw_output]
-    return output[:, 0, :]  # [CLS] token
+    # Batched together with concurrent requests from other essays.
+    return np.stack(embedding_batcher.map(text_list))
+
+def generate_candidates(pre_text, ngram_range=(2, 2), max_candidates=MAX_TOPIC_CANDIDATES):
+    """Distinct n-grams in reading order, most frequent first, capped.
+
+    N-grams that start or end with a stopword are dropped, so "of the" or
+    "learning is" never become topics.
+    """
+    words = WORD_RE.findall(pre_text)
+    counts = Counter()
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        for i in range(len(words) - n + 1):
+            gram = words[i:i + n]
+            if gram[0] in ENGLISH_STOP_WORDS or gram[-1] in ENGLISH_STOP_WORDS:
+                continue
+            counts[" ".join(gram)] += 1
+    # most_common keeps first-seen order among equal counts.
+    return [gram for gram, _ in counts.most_common(max_candidates)]
 
-def extract_topics(text, top_n=3):
+def _top_candidates(candidates, sims, top_n):
+    k = min(top_n, len(candidates))
+    top = np.argpartition(-sims, k - 1)[:k]
+    top = top[np.argsort(-sims[top], kind="stable")]
+    return [candidates[i] for i in top]
+
+def add_topic_spans(context, text):
     pre_text = preprocess(text)
-    words = list(set(pre_text.split()))
-    candidates = [" ".join(words[i:i+2]) for i in range(len(words) - 1)]
+    return context.add("document", [pre_text]).add("candidates", generate_candidates(pre_text))
+
+def extract_topics(text, top_n=3, doc_emb=None, context=None):
+    if context is not None and "candidates" in context:
+        candidates = context.texts("candidates")
+        if not candidates:
+            return []
+        sims = context.similarities("candidates", context.embeddings("document")[0])
+        return _top_candidates(candidates, sims, top_n)
+
+    pre_text = preprocess(text)
+    candidates = generate_candidates(pre_text)
     if not candidates:
         return []
 
-    doc_emb = embed_text_ov([pre_text])[0]
-    cand_embs = embed_text_ov(candidates)
+    if doc_emb is None:
+        doc_emb = embed_text_ov([pre_text])[0]
+    doc_emb = doc_emb / (np.linalg.norm(doc_emb) or 1e-10)
+
+    # Fixed-size chunks keep the padded input tensor bounded however long the text is.
+    sims = np.empty(len(candidates), dtype=np.float32)
+    for start in range(0, len(candidates), EMBED_CHUNK_SIZE):
+        cand_embs = embed_text_ov(candidates[start:start + EMBED_CHUNK_SIZE])
+        norms = np.linalg.norm(cand_embs, axis=1)
+        norms[norms == 0] = 1e-10
+        sims[start:start + len(cand_embs)] = cand_embs @ doc_emb / norms
 
-    norms = np.linalg.norm(cand_embs, axis=1) * np.linalg.norm(doc_emb)
-    sims = np.dot(cand_embs, doc_emb) / norms
-    sorted_pairs = sorted(zip(candidates, sims), key=lambda x: x[1], reverse=True)
-    return [kw for kw, _ in sorted_pairs[:top_n]]
+    return _top_candidates(candidates, sims, top_n)
 
 def topics_are_similar(lecture_topics, essay_topics):
     return any(lt in et or et in lt for lt in lecture_topics for et in essay_topics)
 
-def compute_similarity(lecture_text, essay_text):
-    pair = [(preprocess(lecture_text), preprocess(essay_text))]
-    tokens = cross_tokenizer(pair, padding=True, truncation=True, return_tensors="np")
-    inputs = {name: tokens[name].astype(np.int64) for name in cross_input_names if name in tokens}
-    score = cross_model(inputs)[cross_output]
-    return float(score[0])
+def tokenize_for_cross(text):
+    return model_registry.get("cross_tokenizer")(preprocess(text), add_special_tokens=False)["input_ids"]
+
+def make_lecture_windows(lecture_ids, size=CROSS_WINDOW_TOKENS, stride=CROSS_WINDOW_STRIDE,
+                         max_windows=CROSS_MAX_WINDOWS):
+    """Overlapping token windows covering the whole lecture.
+
+    When there are more than ``max_windows``, an evenly spaced subset is kept
+    so the whole transcript is still sampled, not just its beginning.
+    """
+    if len(lecture_ids) <= size:
+        return [list(lecture_ids)]
+    starts = list(range(0, len(lecture_ids) - size, stride)) + [len(lecture_ids) - size]
+    if len(starts) > max_windows:
+        picks = np.unique(np.linspace(0, len(starts) - 1, max_windows).round().astype(int))
+        starts = [starts[i] for i in picks]
+    return [list(lecture_ids[s:s + size]) for s in starts]
+
+def aggregate_window_scores(scores, policy=CROSS_AGGREGATION, top_k=CROSS_AGGREGATION_TOP_K):
+    scores = np.asarray(scores, dtype=np.float64)
+    if policy == "mean":
+        return float(scores.mean())
+    if policy == "topk":
+        k = min(top_k, len(scores))
+        return float(np.partition(scores, len(scores) - k)[-k:].mean())
+    return float(scores.max())
+
+def compute_similarity(lecture_text, essay_text, lecture_ids=None, lecture_windows=None):
+    # The lecture side is tokenized once per transcript and reused across essays.
+    if lecture_ids is None and lecture_windows is None:
+        lecture_ids = tokenize_for_cross(lecture_text)
+    essay_ids = tokenize_for_cross(essay_text)
+    cross_tokenizer = model_registry.get("cross_tokenizer")
+
+    if CROSS_SCORING_MODE == "truncate":
+        encoded = cross_tokenizer.prepare_for_model(
+            lecture_ids,
+            essay_ids,
+            truncation=True,
+            max_length=cross_tokenizer.model_max_length
+        )
+        return cross_batcher.submit(encoded["input_ids"]).result()
+
+    if lecture_windows is None:
+        lecture_windows = make_lecture_windows(lecture_ids)
+    budget = (cross_tokenizer.model_max_length
+              - cross_tokenizer.num_special_tokens_to_add(pair=True)
+              - max(len(w) for w in lecture_windows))
+    essay_ids = essay_ids[:max(budget, 0)]
+    futures = [
+        cross_batcher.submit(cross_tokenizer.build_inputs_with_special_tokens(window, essay_ids))
+        for window in lecture_windows
+    ]
+    return aggregate_window_scores([f.result() for f in futures])
+
+def transcript_hash(lecture_text):
+    return hashlib.sha256(lecture_text.encode("utf-8")).hexdigest()
+
+def prepare_lecture(lecture_text):
+    """Everything evaluate_engagement needs from a transcript, computed once.
+
+    The result is stored on the session document when the transcript is
+    uploaded, so it must stay BSON-serializable.
+    """
+    doc_emb = embed_text_ov([preprocess(lecture_text)])[0]
+    return {
+        "transcript_hash": transcript_hash(lecture_text),
+        "topics": extract_topics(lecture_text, doc_emb=doc_emb),
+        "doc_embedding": doc_emb.tolist(),
+        "cross_input_ids": tokenize_for_cross(lecture_text)
+    }
+
+def get_lecture_features(lecture_text, stored=None):
+    key = transcript_hash(lecture_text)
+    with _lecture_cache_lock:
+        features = _lecture_cache.get(key)
+        if features is not None:
+            _lecture_cache.move_to_end(key)
+            return features
+
+    if not (stored and stored.get("transcript_hash") == key):
+        stored = prepare_lecture(lecture_text)
+    # Windows depend on CROSS_WINDOW_* settings, so they are derived per
+    # process rather than stored with the session.
+    features = {**stored, "cross_windows": make_lecture_windows(stored["cross_input_ids"])}
+    with _lecture_cache_lock:
+        _lecture_cache[key] = features
+        while len(_lecture_cache) > LECTURE_CACHE_SIZE:
+            _lecture_cache.popitem(last=False)
+    return features
+
+RF_MODEL_PATH = "backend/services/models/Typing_metrics_rf.pkl"
+
+# Where each classifier input comes from, in the order the model was trained
+# on. A missing value counts as 0, exactly as the one-row DataFrame did.
+FEATURE_SOURCES = [
+    ("typing_metrics", "total_words"),
+    ("typing_metrics", "total_time_seconds"),
+    ("typing_metrics", "avg_typing_time_per_word"),
+    ("typing_metrics", "std_typing_time_per_word"),
+    ("typing_metrics", "avg_pause_before_word"),
+    ("typing_metrics", "std_pause_before_word"),
+    ("typing_metrics", "total_backspaces"),
+    ("typing_metrics", "avg_backspaces_per_word"),
+    ("typing_metrics", "typing_speed_wpm"),
+    ("typing_metrics", "long_thinking_pauses"),
+    ("typing_metrics", "total_bursts"),
+    ("typing_metrics", "avg_words_per_burst"),
+    ("typing_metrics", "longest_burst_length"),
+    ("grammar_report", "total_issues"),
+    ("stylometry_report", "total_sentences"),
+    ("stylometry_report", "avg_sentence_length"),
+    ("stylometry_report", "avg_word_length"),
+    ("stylometry_report", "punctuation_count"),
+    ("stylometry_report", "lexical_diversity"),
+    ("stylometry_report", "drift_score"),
+    ("stylometry_report", "avg_semantic_similarity"),
+    ("stylometry_report", "std_semantic_similarity"),
+]
+
+def _feature_columns(feature_names):
+    """FEATURE_SOURCES reordered to match the bundle's feature_names.
+
+    Bundles whose names are the report keys are matched by name; otherwise
+    the names are taken to be in FEATURE_SOURCES order.
+    """
+    by_key = {key: (section, key) for section, key in FEATURE_SOURCES}
+    if len(feature_names) == len(FEATURE_SOURCES) and all(name in by_key for name in feature_names):
+        return [by_key[name] for name in feature_names]
+    if len(feature_names) != len(FEATURE_SOURCES):
+        raise ValueError(f"Model expects {len(feature_names)} features, engine provides {len(FEATURE_SOURCES)}")
+    return list(FEATURE_SOURCES)
 
-_rf_bundle = None
 def load_rf_model_bundle():
-    global _rf_bundle
-    if _rf_bundle is None:
-        with open("backend/services/models/Typing_metrics_rf.pkl", "rb") as f:
-            _rf_bundle = pickle.load(f)
-    return _rf_bundle
+    with open(RF_MODEL_PATH, "rb") as f:
+        bundle = pickle.load(f)
+    bundle["feature_columns"] = _feature_columns(list(bundle["feature_names"]))
+    bundle["class_labels"] = [str(label) for label in bundle["label_encoder"].inverse_transform(bundle["model"].classes_)]
+    return bundle
 
-def classify_thoughtfulness(analysis_report):
-    rf_bundle = load_rf_model_bundle()
-    model = rf_bundle["model"]
-    scaler = rf_bundle["scaler"]
-    label_encoder = rf_bundle["label_encoder"]
-    feature_names = rf_bundle["feature_names"]
-
-    typing = analysis_report["typing_metrics"]
-    grammar = analysis_report["grammar_report"]
-    stylometry = analysis_report["stylometry_report"]
-
-    features = [
-        typing.get("total_words", 0),
-        typing.get("total_time_seconds", 0),
-        typing.get("avg_typing_time_per_word", 0),
-        typing.get("std_typing_time_per_word", 0),
-        typing.get("avg_pause_before_word", 0),
-        typing.get("std_pause_before_word", 0),
-        typing.get("total_backspaces", 0),
-        typing.get("avg_backspaces_per_word", 0),
-        typing.get("typing_speed_wpm", 0),
-        typing.get("long_thinking_pauses", 0),
-        typing.get("total_bursts", 0),
-        typing.get("avg_words_per_burst", 0),
-        typing.get("longest_burst_length", 0),
-        grammar.get("total_issues", 0),
-        stylometry.get("total_sentences", 0),
-        stylometry.get("avg_sentence_length", 0),
-        stylometry.get("avg_word_length", 0),
-        stylometry.get("punctuation_count", 0),
-        stylometry.get("lexical_diversity", 0),
-        stylometry.get("drift_score", 0),
-        stylometry.get("avg_semantic_similarity", 0),
-        stylometry.get("std_semantic_similarity", 0),
+model_registry.register("thoughtfulness_rf", load_rf_model_bundle)
+
+# Everything an essay needs; the scoring worker waits for these and
+# /readyz reports them.
+SCORING_MODELS = ("minilm_tokenizer", "minilm", "cross_tokenizer", "cross_encoder", "thoughtfulness_rf", "language_tool")
+
+def build_feature_matrix(analysis_reports, feature_columns):
+    matrix = np.zeros((len(analysis_reports), len(feature_columns)), dtype=np.float64)
+    for row, report in enumerate(analysis_reports):
+        for col, (section, key) in enumerate(feature_columns):
+            matrix[row, col] = report[section].get(key, 0)
+    return matrix
+
+def classify_thoughtfulness_batch(analysis_reports):
+    """Label many analysis reports with one scale and one forest pass.
+
+    Returns ``{"label": ..., "probabilities": {label: p}}`` per report.
+    """
+    if not analysis_reports:
+        return []
+    bundle = model_registry.get("thoughtfulness_rf")
+    features = build_feature_matrix(analysis_reports, bundle["feature_columns"])
+    with warnings.catch_warnings():
+        # The scaler was fitted on a DataFrame; a plain array is equivalent.
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        scaled = bundle["scaler"].transform(features)
+    probabilities = bundle["model"].predict_proba(scaled)
+    # A random forest predicts the class with the highest mean probability.
+    labels = [bundle["class_labels"][i] for i in probabilities.argmax(axis=1)]
+    return [
+        {"label": label, "probabilities": dict(zip(bundle["class_labels"], map(float, probs)))}
+        for label, probs in zip(labels, probabilities)
     ]
-    df = pd.DataFrame([features], columns=feature_names)
-    scaled = scaler.transform(df)
-    pred = model.predict(scaled)[0]
-    return label_encoder.inverse_transform([pred])[0]  
 
-async def evaluate_engagement(essay_doc):
-    analysis_report = analyze_typing_data_dict(essay_doc["typing_data"])
-    style = classify_thoughtfulness(analysis_report)
+def classify_thoughtfulness(analysis_report):
+    return classify_thoughtfulness_batch([analysis_report])[0]["label"]
+
+def _analyze_essay(essay_doc):
+    # Drift chunks and topic spans are embedded together in one pass.
+    session = TypingSession.from_dict(essay_doc["typing_data"])
+    embeddings = EssayEmbeddingContext().add("chunks", drift_chunks(session.sentences))
+    if essay_doc.get("lecture_text") and essay_doc.get("essay_text"):
+        add_topic_spans(embeddings, essay_doc["essay_text"])
+
+    analysis_report = analyze_typing_session(session, embeddings, essay_doc.get("typing_metrics"))
+    return analysis_report, embeddings
 
+def _engagement_report(essay_doc, style, embeddings):
     lecture_text = essay_doc.get("lecture_text", "")
     essay_text = essay_doc.get("essay_text", "")
 
     similarity_score = 0.0
     if lecture_text and essay_text:
-        l_topics = extract_topics(lecture_text)
-        e_topics = extract_topics(essay_text)
-        if topics_are_similar(l_topics, e_topics):
-            similarity_score = compute_similarity(lecture_text, essay_text)
+        lecture = get_lecture_features(lecture_text, essay_doc.get("lecture_features"))
+        e_topics = extract_topics(essay_text, context=embeddings)
+        if topics_are_similar(lecture["topics"], e_topics):
+            similarity_score = compute_similarity(
+                lecture_text,
+                essay_text,
+                lecture_ids=lecture["cross_input_ids"],
+                lecture_windows=lecture["cross_windows"]
+            )
 
     if style == "copy":
         engagement = -1
@@ -130,3 +311,19 @@ async def evaluate_engagement(essay_doc):
         "typing_style": style,
         "similarity_score": round(similarity_score, 3),
     }
+
+def score_essays(essay_docs):
+    """Score several essays, classifying their typing style in one batch."""
+    analyzed = [_analyze_essay(doc) for doc in essay_docs]
+    styles = classify_thoughtfulness_batch([report for report, _ in analyzed])
+    return [
+        _engagement_report(doc, style["label"], embeddings)
+        for doc, style, (_, embeddings) in zip(essay_docs, styles, analyzed)
+    ]
+
+def score_essay(essay_doc):
+    return score_essays([essay_doc])[0]
+
+async def evaluate_engagement(essay_doc):
+    # Raises ScoringPoolSaturated when the scoring backlog is full.
+    return await scoring_pool.run(score_essay, essay_doc)
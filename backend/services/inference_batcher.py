@@ -0,0 +1,133 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+import numpy as np
+from backend.services import model_registry
+
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item requests into batched model calls.
+
+    Callers submit items from any thread. A background thread collects items
+    until ``max_batch_size`` are queued or the oldest has waited
+    ``max_wait_ms``, passes them to ``run_batch`` in one call and resolves
+    each caller's future with its own result.
+    """
+
+    def __init__(self, name, run_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, history=1000):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._waits = deque(maxlen=history)
+        self._items = 0
+        self._batches = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+                    self._thread.start()
+
+    def submit(self, item):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((time.monotonic(), item, future))
+        return future
+
+    def map(self, items):
+        futures = [self.submit(item) for item in items]
+        return [f.result() for f in futures]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][0] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            try:
+                results = self.run_batch([item for _, item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: {len(results)} results for a batch of {len(batch)}")
+                for (_, _, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                # Whatever failed, no caller may be left waiting on its future.
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._waits.extend(started - enqueued for enqueued, _, _ in batch)
+
+    def metrics(self):
+        with self._lock:
+            waits = np.array(self._waits) * 1000 if self._waits else np.zeros(1)
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "queue_depth": self._queue.qsize(),
+                "wait_ms_p50": round(float(np.percentile(waits, 50)), 3),
+                "wait_ms_p95": round(float(np.percentile(waits, 95)), 3),
+                "wait_ms_max": round(float(waits.max()), 3)
+            }
+
+
+def pad_encodings(encodings, pad_token_id):
+    """Right-pad a list of token-id lists into input_ids/attention_mask arrays."""
+    width = max(len(ids) for ids in encodings)
+    input_ids = np.full((len(encodings), width), pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros((len(encodings), width), dtype=np.int64)
+    for row, ids in enumerate(encodings):
+        input_ids[row, :len(ids)] = ids
+        attention_mask[row, :len(ids)] = 1
+    return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+
+def _embed_batch(texts):
+    tokens = model_registry.get("minilm_tokenizer")(texts, padding=True, truncation=True, return_tensors="np")
+    return list(model_registry.get("minilm")(tokens)[:, 0, :])  # [CLS] token
+
+
+def _score_pairs_batch(input_ids):
+    tokens = pad_encodings(input_ids, model_registry.get("cross_tokenizer").pad_token_id)
+    scores = model_registry.get("cross_encoder")(tokens)
+    return [float(s) for s in scores.reshape(len(input_ids), -1)[:, 0]]
+
+
+# Items are single texts; results are their [CLS] embeddings.
+embedding_batcher = MicroBatcher("minilm_embedding", _embed_batch)
+# Items are encoded (lecture, essay) input_ids; results are similarity scores.
+cross_batcher = MicroBatcher("cross_encoder", _score_pairs_batch)
+
+batchers = {b.name: b for b in (embedding_batcher, cross_batcher)}
+
+
+def inference_metrics():
+    return {name: b.metrics() for name, b in batchers.items()}
@@ -0,0 +1,266 @@
+import hashlib
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import numpy as np
+from transformers import AutoTokenizer
+from openvino.runtime import Core
+
+MODELS_DIR = os.path.join("backend", "services", "models")
+MINILM_MODEL_PATH = os.path.join(MODELS_DIR, "openvino_minilm", "model.xml")
+CROSS_MODEL_PATH = os.path.join(MODELS_DIR, "openvino_cross", "model.xml")
+
+MINILM_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+CROSS_TOKENIZER = "cross-encoder/stsb-roberta-base"
+
+logger = logging.getLogger(__name__)
+
+INFER_POOL_SIZE = int(os.getenv("OV_INFER_POOL_SIZE", "4"))
+DEVICE = os.getenv("OV_DEVICE", "CPU")
+# Compiled blobs are cached here so restarts skip graph compilation. Set to
+# an empty string to disable.
+CACHE_DIR = os.getenv("OV_CACHE_DIR", os.path.join(MODELS_DIR, "ov_cache"))
+# prune_model_caches() keeps other cache directories modified more recently.
+CACHE_PRUNE_AGE = int(os.getenv("OV_CACHE_PRUNE_AGE", "86400"))
+
+# Time to first inference is reported from here. This is module import
+# time unless the entry point passes its own start to mark_process_start().
+_process_started = time.perf_counter()
+
+
+def mark_process_start(started):
+    """Measure time to first inference from ``started`` (a perf_counter value)."""
+    global _process_started
+    _process_started = started
+
+
+class PooledModel:
+    """A compiled OpenVINO model with a fixed pool of infer requests.
+
+    Each call borrows one request from the pool, so concurrent callers never
+    share request state and the number of in-flight inferences is bounded.
+    """
+
+    def __init__(self, compiled_model, pool_size=INFER_POOL_SIZE, name="model"):
+        self.compiled_model = compiled_model
+        self.name = name
+        self._first_inference_logged = False
+        self.input_names = [inp.get_any_name() for inp in compiled_model.inputs]
+        self.output = compiled_model.output(0)
+        self._requests = queue.Queue()
+        for _ in range(max(1, pool_size)):
+            self._requests.put(compiled_model.create_infer_request())
+
+    def prepare_inputs(self, tokens):
+        return {name: np.asarray(tokens[name], dtype=np.int64) for name in self.input_names if name in tokens}
+
+    def infer(self, inputs):
+        request = self._requests.get()
+        try:
+            results = request.infer(inputs)
+            # The request's output buffer is reused by the next call.
+            output = np.array(results[self.output], copy=True)
+        finally:
+            self._requests.put(request)
+        if not self._first_inference_logged:
+            self._first_inference_logged = True
+            logger.info("First %s inference %.2fs after start", self.name, time.perf_counter() - _process_started)
+        return output
+
+    def __call__(self, tokens):
+        return self.infer(self.prepare_inputs(tokens))
+
+
+class SharedTokenizer:
+    """Serializes calls to a shared Hugging Face tokenizer.
+
+    Fast tokenizers mutate their padding/truncation state on every call and
+    raise "Already borrowed" when two threads encode at once.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            return self.tokenizer(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.tokenizer, name)
+
+
+_lock = threading.Lock()
+_core = None
+_models = {}
+_tokenizers = {}
+
+
+def get_core():
+    global _core
+    if _core is None:
+        with _lock:
+            if _core is None:
+                _core = Core()
+    return _core
+
+
+def model_fingerprint(model_path):
+    """Hash of model.xml and its weights, used to key the blob cache.
+
+    The weights are hashed in full: retrained weights of the same size must
+    not reuse a blob compiled from the old ones.
+    """
+    digest = hashlib.sha256()
+    weights_path = os.path.splitext(model_path)[0] + ".bin"
+    for path in (model_path, weights_path):
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def model_cache_dir(model_path, cache_dir=None):
+    """Per-model cache directory, e.g. ``ov_cache/openvino_minilm-<hash>``.
+
+    A changed model gets a new directory. Old ones are left in place, since
+    a process still running the previous model may be using them; see
+    prune_model_caches().
+    """
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir:
+        return None
+    model_name = os.path.basename(os.path.dirname(os.path.abspath(model_path)))
+    path = os.path.join(cache_dir, f"{model_name}-{model_fingerprint(model_path)}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def prune_model_caches(model_path, cache_dir=None, min_age=CACHE_PRUNE_AGE):
+    """Remove this model's other cache directories not written to for ``min_age`` seconds.
+
+    Run from backend.scripts.prewarm_models, never while loading: during a
+    rolling restart the old processes still read and write their directory.
+    """
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return []
+    current = model_cache_dir(model_path, cache_dir)
+    prefix = os.path.basename(current).rsplit("-", 1)[0] + "-"
+    removed = []
+    for entry in os.listdir(cache_dir):
+        stale = os.path.join(cache_dir, entry)
+        if not entry.startswith(prefix) or stale == current or not os.path.isdir(stale):
+            continue
+        if time.time() - os.path.getmtime(stale) < min_age:
+            continue
+        logger.info("Removing stale OpenVINO cache %s", stale)
+        shutil.rmtree(stale, ignore_errors=True)
+        removed.append(stale)
+    return removed
+
+
+def get_model(model_path, device=DEVICE):
+    key = (os.path.abspath(model_path), device)
+    model = _models.get(key)
+    if model is None:
+        core = get_core()
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                name = os.path.basename(os.path.dirname(key[0]))
+                cache_path = model_cache_dir(model_path)
+                config = {"CACHE_DIR": cache_path} if cache_path else {}
+                cached = bool(cache_path and os.listdir(cache_path))
+                started = time.perf_counter()
+                compiled = core.compile_model(model_path, device, config)
+                logger.info("Compiled %s on %s in %.2fs (%s)", name, device, time.perf_counter() - started,
+                            "cached blob" if cached else "no cached blob" if cache_path else "cache disabled")
+                model = PooledModel(compiled, name=name)
+                _models[key] = model
+    return model
+
+
+def load_warm_model(model_path, tokenizer_name):
+    """Compile a model and run one tiny inference so the first essay doesn't pay for it."""
+    model = get_model(model_path)
+    model(get_tokenizer(tokenizer_name)("warm up", return_tensors="np"))
+    return model
+
+
+def get_tokenizer(name):
+    tokenizer = _tokenizers.get(name)
+    if tokenizer is None:
+        with _lock:
+            tokenizer = _tokenizers.get(name)
+            if tokenizer is None:
+                tokenizer = SharedTokenizer(AutoTokenizer.from_pretrained(name))
+                _tokenizers[name] = tokenizer
+    return tokenizer
+
+
+# Named, lazily loaded resources. Modules register a loader at import time
+# (cheap); the loader runs on first get() or when warm_up() is called from a
+# background thread at startup, and its progress is reported by status().
+_loaders = {}
+_loaded = {}
+_status = {}
+_load_locks = {}
+
+
+def register(name, loader):
+    with _lock:
+        _loaders[name] = loader
+        _load_locks.setdefault(name, threading.Lock())
+        _status.setdefault(name, {"state": "pending"})
+
+
+def get(name):
+    if name in _loaded:
+        return _loaded[name]
+    with _load_locks[name]:
+        if name not in _loaded:
+            _status[name] = {"state": "loading"}
+            started = time.perf_counter()
+            try:
+                value = _loaders[name]()
+            except Exception as e:
+                _status[name] = {"state": "failed", "error": str(e)}
+                raise
+            _loaded[name] = value
+            _status[name] = {"state": "ready", "load_seconds": round(time.perf_counter() - started, 3)}
+            logger.info("Loaded %s in %.2fs", name, _status[name]["load_seconds"])
+    return _loaded[name]
+
+
+def is_ready(*names):
+    return all(name in _loaded for name in (names or _loaders))
+
+
+def status():
+    return {name: dict(_status[name]) for name in sorted(_loaders)}
+
+
+def warm_up(names=None):
+    for name in names or list(_loaders):
+        try:
+            get(name)
+        except Exception:
+            logger.exception("Failed to load %s", name)
+
+
+def start_warm_up(names=None):
+    thread = threading.Thread(target=warm_up, args=(names,), name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+register("minilm_tokenizer", lambda: get_tokenizer(MINILM_TOKENIZER))
+register("minilm", lambda: load_warm_model(MINILM_MODEL_PATH, MINILM_TOKENIZER))
+register("cross_tokenizer", lambda: get_tokenizer(CROSS_TOKENIZER))
+register("cross_encoder", lambda: load_warm_model(CROSS_MODEL_PATH, CROSS_TOKENIZER))
@@ -1,15 +1,262 @@
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer, util
-qa_pipeline = pipeline("text2text-generation", model="google/flan-t5-base")
-similarity_model = SentenceTransformer("all-MiniLM-L6-v2")
-
-def answer_question_from_transcript(transcript: str, question: str, threshold: float = 0.4) -> str:
-    transcript_embedding = similarity_model.encode(transcript, convert_to_tensor=True)
-    question_embedding = similarity_model.encode(question, convert_to_tensor=True)
-    similarity_score = util.pytorch_cos_sim(transcript_embedding, question_embedding).item()
-
-    if similarity_score < threshold:
-        return "⚠️ This question appears to be outside the scope of the current lecture."
-    prompt = f"Transcript: {transcript}\n\nQuestion: {question}\nAnswer:"
-    result = qa_pipeline(prompt, max_length=100, do_sample=False)
-    return result[0]['generated_text']
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from bson.binary import Binary
+from backend.services import model_registry
+from backend.services.engagement_engine import transcript_hash
+from backend.services.inference_batcher import MicroBatcher, batchers
+
+logger = logging.getLogger(__name__)
+
+QA_CHUNK_WORDS = int(os.getenv("QA_CHUNK_WORDS", "120"))
+QA_CHUNK_OVERLAP = int(os.getenv("QA_CHUNK_OVERLAP", "30"))
+QA_TOP_K = int(os.getenv("QA_TOP_K", "3"))
+QA_INDEX_CACHE_SIZE = int(os.getenv("QA_INDEX_CACHE_SIZE", "32"))
+QA_ANSWER_CACHE_SIZE = int(os.getenv("QA_ANSWER_CACHE_SIZE", "256"))
+
+QA_MODEL_NAME = "google/flan-t5-base"
+# Written by backend.scripts.export_flan_t5 and committed through LFS like
+# the other IRs. Without it the generator fails to load (and /readyz stays
+# 503) unless QA_PYTORCH_FALLBACK=1, meant for development only.
+QA_GENERATOR_PATH = os.getenv("QA_GENERATOR_PATH", os.path.join(model_registry.MODELS_DIR, "openvino_flan_t5"))
+QA_GENERATOR_XML = os.path.join(QA_GENERATOR_PATH, "openvino_encoder_model.xml")
+QA_PYTORCH_FALLBACK = os.getenv("QA_PYTORCH_FALLBACK", "0") == "1"
+QA_MAX_NEW_TOKENS = int(os.getenv("QA_MAX_NEW_TOKENS", "100"))
+QA_MAX_BATCH_SIZE = int(os.getenv("QA_MAX_BATCH_SIZE", "8"))
+QA_MAX_WAIT_MS = float(os.getenv("QA_MAX_WAIT_MS", "20"))
+
+OUT_OF_SCOPE_ANSWER = "⚠️ This question appears to be outside the scope of the current lecture."
+
+
+class _BatchStreamer:
+    """Generation streamer that forwards each row's new text to its own sink.
+
+    transformers' TextIteratorStreamer only handles a batch of one; this
+    takes the (batch,) token tensor ``generate`` emits per step, so every
+    question in a batch streams. Rows without a sink are skipped.
+    """
+
+    def __init__(self, tokenizer, sinks):
+        self.tokenizer = tokenizer
+        self.sinks = sinks
+        self.tokens = [[] for _ in sinks]
+        self.sent = [0] * len(sinks)
+        self.started = False
+
+    def put(self, value):
+        if not self.started:
+            # The first call carries the decoder start tokens.
+            self.started = True
+            return
+        for row, token in enumerate(value.reshape(len(self.sinks), -1)[:, -1].tolist()):
+            if self.sinks[row] is None:
+                continue
+            self.tokens[row].append(token)
+            text = self.tokenizer.decode(self.tokens[row], skip_special_tokens=True)
+            if len(text) > self.sent[row]:
+                try:
+                    self.sinks[row](text[self.sent[row]:])
+                except Exception:
+                    # A departed listener must not fail the rest of the batch.
+                    logger.warning("Dropping answer stream for row %d", row, exc_info=True)
+                    self.sinks[row] = None
+                self.sent[row] = len(text)
+
+    def end(self):
+        pass
+
+
+class AnswerGenerator:
+    """flan-t5 and its tokenizer, generating greedy answers for a batch of prompts."""
+
+    def __init__(self, model, tokenizer, backend):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.backend = backend
+
+    def generate(self, prompts, sinks=None, max_new_tokens=QA_MAX_NEW_TOKENS):
+        inputs = self.tokenizer(prompts, padding=True, truncation=True, return_tensors="pt")
+        streamer = _BatchStreamer(self.tokenizer, sinks) if sinks and any(sinks) else None
+        outputs = self.model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False, streamer=streamer)
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+def _load_qa_generator():
+    from transformers import AutoTokenizer
+    if os.path.exists(QA_GENERATOR_XML):
+        from optimum.intel import OVModelForSeq2SeqLM
+        cache_path = model_registry.model_cache_dir(QA_GENERATOR_XML)
+        model = OVModelForSeq2SeqLM.from_pretrained(
+            QA_GENERATOR_PATH, device=model_registry.DEVICE,
+            ov_config={"CACHE_DIR": cache_path} if cache_path else {}
+        )
+        tokenizer = AutoTokenizer.from_pretrained(QA_GENERATOR_PATH)
+        backend = "openvino"
+    elif not QA_PYTORCH_FALLBACK:
+        raise FileNotFoundError(
+            f"{QA_GENERATOR_XML} not found: run backend.scripts.export_flan_t5 "
+            "(or `git lfs pull`), or set QA_PYTORCH_FALLBACK=1 for development"
+        )
+    else:
+        logger.warning("%s not found; generating answers with PyTorch (QA_PYTORCH_FALLBACK=1)", QA_GENERATOR_PATH)
+        from transformers import AutoModelForSeq2SeqLM
+        model = AutoModelForSeq2SeqLM.from_pretrained(QA_MODEL_NAME).eval()
+        tokenizer = AutoTokenizer.from_pretrained(QA_MODEL_NAME)
+        backend = "pytorch"
+    return AnswerGenerator(model, model_registry.SharedTokenizer(tokenizer), backend)
+
+
+def _load_qa_embedder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+
+# Loaded on first question or by the startup warm-up, not at import.
+model_registry.register("qa_generator", _load_qa_generator)
+model_registry.register("qa_embedder", _load_qa_embedder)
+QA_MODELS = ("qa_embedder", "qa_generator")
+
+_index_cache = OrderedDict()
+_answer_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(cache, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache, key, value, size):
+    with _cache_lock:
+        cache[key] = value
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+
+def embed_passages(texts):
+    """Unit-length float32 embeddings, one row per text."""
+    return model_registry.get("qa_embedder").encode(
+        list(texts), convert_to_numpy=True, normalize_embeddings=True
+    ).astype(np.float32)
+
+
+def chunk_transcript(transcript, size=QA_CHUNK_WORDS, overlap=QA_CHUNK_OVERLAP):
+    words = transcript.split()
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    stride = max(1, size - overlap)
+    starts = list(range(0, len(words) - size, stride)) + [len(words) - size]
+    return [" ".join(words[s:s + size]) for s in starts]
+
+
+def build_transcript_index(transcript):
+    """Chunk and embed a transcript once, for top-k retrieval per question.
+
+    The result is stored on the session document at upload time, so the
+    matrix is kept as raw float32 bytes.
+    """
+    chunks = chunk_transcript(transcript)
+    embeddings = embed_passages(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+    return {
+        "transcript_hash": transcript_hash(transcript),
+        "chunks": chunks,
+        "dim": int(embeddings.shape[1]) if chunks else 0,
+        "embeddings": Binary(embeddings.tobytes())
+    }
+
+
+def get_transcript_index(transcript, stored=None):
+    """(hash, chunks, matrix) for a transcript: LRU cache, then stored, then built."""
+    key = transcript_hash(transcript)
+    index = _cache_get(_index_cache, key)
+    if index is not None:
+        return index
+
+    if not (stored and stored.get("transcript_hash") == key):
+        stored = build_transcript_index(transcript)
+    if stored["chunks"]:
+        matrix = np.frombuffer(bytes(stored["embeddings"]), dtype=np.float32).reshape(len(stored["chunks"]), -1)
+    else:
+        # A blank transcript has nothing to reshape; every question is out of scope.
+        matrix = np.zeros((0, 0), dtype=np.float32)
+    index = (key, stored["chunks"], matrix)
+    _cache_put(_index_cache, key, index, QA_INDEX_CACHE_SIZE)
+    return index
+
+
+def retrieve_chunks(index, question, top_k=QA_TOP_K):
+    """Indices of the best-matching chunks (in transcript order) and the best score."""
+    _, chunks, matrix = index
+    if not chunks:
+        return [], 0.0
+    scores = matrix @ embed_passages([question])[0]
+    k = min(top_k, len(chunks))
+    best = np.argpartition(scores, len(scores) - k)[-k:]
+    return sorted(best.tolist()), float(scores[best].max())
+
+
+def _normalize_question(question):
+    return re.sub(r"\s+", " ", question.strip().lower())
+
+
+def _generate_batch(items):
+    prompts = [prompt for prompt, _ in items]
+    return model_registry.get("qa_generator").generate(prompts, [sink for _, sink in items])
+
+
+# Items are (prompt, sink or None); concurrent questions share one generate call.
+generation_batcher = MicroBatcher("qa_generation", _generate_batch, QA_MAX_BATCH_SIZE, QA_MAX_WAIT_MS)
+batchers[generation_batcher.name] = generation_batcher
+
+
+def _prepare_answer(transcript, question, threshold, stored_index):
+    """(cache key, answer, prompt): the answer when no generation is needed, else the prompt."""
+    index = get_transcript_index(transcript, stored_index)
+    cache_key = (index[0], _normalize_question(question))
+    answer = _cache_get(_answer_cache, cache_key)
+    if answer is not None:
+        return cache_key, answer, None
+
+    best, score = retrieve_chunks(index, question)
+    if score < threshold:
+        return cache_key, OUT_OF_SCOPE_ANSWER, None
+    context = "\n".join(index[1][i] for i in best)
+    return cache_key, None, f"Transcript: {context}\n\nQuestion: {question}\nAnswer:"
+
+
+def stream_answer(transcript, question, on_text, threshold=0.4, stored_index=None):
+    """Generate an answer, passing each new piece of text to ``on_text``.
+
+    Returns a Future of the full answer. Cached and out-of-scope answers are
+    passed to ``on_text`` in one piece.
+    """
+    cache_key, answer, prompt = _prepare_answer(transcript, question, threshold, stored_index)
+    if answer is not None:
+        _cache_put(_answer_cache, cache_key, answer, QA_ANSWER_CACHE_SIZE)
+        on_text(answer)
+        future = Future()
+        future.set_result(answer)
+        return future
+
+    def cache_answer(done):
+        if done.exception() is None:
+            _cache_put(_answer_cache, cache_key, done.result(), QA_ANSWER_CACHE_SIZE)
+
+    future = generation_batcher.submit((prompt, on_text))
+    future.add_done_callback(cache_answer)
+    return future
+
+
+def answer_question_from_transcript(transcript: str, question: str, threshold: float = 0.4, stored_index=None) -> str:
+    cache_key, answer, prompt = _prepare_answer(transcript, question, threshold, stored_index)
+    if answer is None:
+        answer = generation_batcher.submit((prompt, None)).result()
+    _cache_put(_answer_cache, cache_key, answer, QA_ANSWER_CACHE_SIZE)
+    return answer
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+SCORING_EXECUTOR = os.getenv("SCORING_EXECUTOR", "thread")
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "2"))
+SCORING_QUEUE_SIZE = int(os.getenv("SCORING_QUEUE_SIZE", "16"))
+SCORING_RETRY_AFTER = int(os.getenv("SCORING_RETRY_AFTER", "15"))
+
+
+class ScoringPoolSaturated(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Scoring queue is full")
+        self.retry_after = retry_after
+
+
+class ScoringPool:
+    """Runs CPU-bound scoring off the event loop with a bounded backlog.
+
+    ``workers`` jobs run at once on a thread or process pool and up to
+    ``queue_size`` more may wait. Submitting beyond that raises
+    ScoringPoolSaturated immediately instead of queueing without bound.
+    """
+
+    def __init__(self, kind=SCORING_EXECUTOR, workers=SCORING_WORKERS,
+                 queue_size=SCORING_QUEUE_SIZE, retry_after=SCORING_RETRY_AFTER):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown scoring executor {kind!r}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self.retry_after = retry_after
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scoring")
+        return self._executor
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def has_capacity(self):
+        return self._in_flight < self.capacity
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise ScoringPoolSaturated(self.retry_after)
+            executor = self._get_executor()
+            self._in_flight += 1
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        # Released when the job really finishes, even if the caller stops waiting.
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+scoring_pool = ScoringPool()
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+from backend.db.db import typing_logs_collection
+from backend.db.jobs import (
+    VISIBILITY_TIMEOUT, MAX_ATTEMPTS, claim_scoring_job, complete_scoring_job,
+    extend_scoring_job_lease, fail_scoring_job, release_scoring_job, requeue_orphaned_logs
+)
+from backend.db.repository import SESSION_FOR_SCORING, session_by_id
+from backend.db.rollups import record_score
+from backend.db.transactions import run_in_transaction
+from backend.services.engagement_engine import evaluate_engagement
+from backend.services.scoring_pool import ScoringPoolSaturated, scoring_pool
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv("SCORING_POLL_INTERVAL", "1.0"))
+SWEEP_INTERVAL = float(os.getenv("SCORING_SWEEP_INTERVAL", "60"))
+# Single-process deployments score in the web app. With
+# SCORING_EMBEDDED_WORKER=0, backend.scripts.scoring_worker scores instead;
+# the web app then neither warms the scoring models nor precomputes lecture
+# features on transcript upload, so it never loads them.
+EMBEDDED_WORKER = os.getenv("SCORING_EMBEDDED_WORKER", "1") == "1"
+
+
+async def _mark_log(log_id, fields):
+    await typing_logs_collection.update_one({"_id": log_id}, {"$set": fields})
+
+
+async def build_essay_doc(typing_log):
+    session = await session_by_id(typing_log["session_id"], SESSION_FOR_SCORING)
+    raw_log = typing_log.get("raw_log", {})
+    return {
+        "essay_text": raw_log.get("essay_text", ""),
+        "typing_data": raw_log.get("typing_data", {}),
+        "lecture_text": session.get("transcript_text", "") if session else "",
+        "lecture_features": session.get("lecture_features") if session else None,
+        "typing_metrics": typing_log.get("typing_metrics")
+    }
+
+
+async def process_job(job, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+    log_id = job["typing_log_id"]
+
+    if job["attempts"] > MAX_ATTEMPTS:
+        # Every earlier worker died while holding this job.
+        await fail_scoring_job(job, "Exceeded maximum attempts", max_attempts=0)
+        await _mark_log(log_id, {"status": "failed"})
+        return
+
+    typing_log = await typing_logs_collection.find_one({"_id": log_id})
+    if not typing_log:
+        await fail_scoring_job(job, "Typing log not found", max_attempts=0)
+        return
+
+    try:
+        future = asyncio.ensure_future(evaluate_engagement(await build_essay_doc(typing_log)))
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=visibility_timeout / 3)
+            if done:
+                break
+            await extend_scoring_job_lease(job["_id"], worker_id, visibility_timeout)
+        report = future.result()
+    except ScoringPoolSaturated as e:
+        await release_scoring_job(job["_id"], worker_id, delay=e.retry_after)
+        return
+    except Exception as e:
+        logger.exception("Scoring job %s failed", job["_id"])
+        if await fail_scoring_job(job, e):
+            await _mark_log(log_id, {"status": "failed", "scoring_error": str(e)})
+        return
+
+    # Only the first completion counts towards the rollup, in case a job
+    # whose lease expired was scored twice. Both writes commit together, so
+    # a worker dying in between can't leave a completed log uncounted.
+    async def complete_log(db_session):
+        result = await typing_logs_collection.update_one(
+            {"_id": log_id, "status": {"$ne": "completed"}},
+            {"$set": {"analysis_report": report, "status": "completed", "scored_at": datetime.utcnow()}},
+            session=db_session
+        )
+        if result.modified_count:
+            await record_score(typing_log["session_id"], report, session=db_session)
+
+    await run_in_transaction(complete_log)
+    await complete_scoring_job(job["_id"], worker_id)
+
+
+def _job_finished(tasks, task):
+    tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        # The lease will expire and another worker will retry the job.
+        logger.error("Scoring task crashed", exc_info=task.exception())
+
+
+async def _sweep_orphans():
+    try:
+        requeued = await requeue_orphaned_logs()
+    except Exception:
+        logger.exception("Could not sweep for orphaned typing logs")
+        return
+    if requeued:
+        logger.warning("Re-enqueued %d pending typing log(s) that had no scoring job", len(requeued))
+
+
+async def run_worker(worker_id=None, stop_event=None, poll_interval=POLL_INTERVAL, sweep_interval=SWEEP_INTERVAL):
+    """Claim and score jobs until ``stop_event`` is set.
+
+    At most ``scoring_pool.workers`` jobs are held at a time, so a worker
+    never leases more essays than it can score before the lease expires.
+    Every ``sweep_interval`` seconds it also re-enqueues pending logs that
+    lost their job.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stop_event = stop_event or asyncio.Event()
+    tasks = set()
+    next_sweep = time.monotonic()
+    logger.info("Scoring worker %s started", worker_id)
+
+    while not stop_event.is_set():
+        if time.monotonic() >= next_sweep:
+            await _sweep_orphans()
+            next_sweep = time.monotonic() + sweep_interval
+
+        if len(tasks) >= scoring_pool.workers:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            continue
+
+        try:
+            job = await claim_scoring_job(worker_id)
+        except Exception:
+            logger.exception("Could not claim a scoring job")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        task = asyncio.create_task(process_job(job, worker_id))
+        tasks.add(task)
+        task.add_done_callback(lambda t: _job_finished(tasks, t))
+
+    if tasks:
+        await asyncio.wait(tasks)
+    logger.info("Scoring worker %s stopped", worker_id)
@@ -1,54 +1,52 @@
-import json
 import numpy as np
-from statistics import mean, stdev
+
+def _mean(values):
+    return float(values.mean()) if values.size else 0
+
+def _stdev(values):
+    # Sample standard deviation, matching statistics.stdev.
+    return float(values.std(ddof=1)) if values.size > 1 else 0
 
 class TypingAnalyzer:
-    def __init__(self, filepath):
-        with open(filepath, "r") as f:
-            self.data = json.load(f)
-        self.words = self.data.get("words", [])
-        self.session_start = self.data["session_start_time"]
-        self.session_end = self.data["session_end_time"]
-        self.duration = self.data["duration_seconds"]
+    def __init__(self, session):
+        self.session = session
+        self.words = session.words
+        self.session_start = session.session_start_time
+        self.session_end = session.session_end_time
+        self.duration = session.duration_seconds
 
     def analyze(self):
-        word_durations = [w["duration"] for w in self.words if "duration" in w]
-        pauses = [w["pause_before"] for w in self.words if w.get("pause_before") is not None]
-        backspaces = [w["backspaces"] for w in self.words]
+        columns = self.session.columns
+        word_durations = columns.duration[~np.isnan(columns.duration)]
+        pauses = columns.pause_before[~np.isnan(columns.pause_before)]
+        backspaces = columns.backspaces
 
         metrics = {
             "total_words": len(self.words),
             "total_time_seconds": self.duration,
-            "avg_typing_time_per_word": mean(word_durations) if word_durations else 0,
-            "std_typing_time_per_word": stdev(word_durations) if len(word_durations) > 1 else 0,
-            "avg_pause_before_word": mean(pauses) if pauses else 0,
-            "std_pause_before_word": stdev(pauses) if len(pauses) > 1 else 0,
-            "total_backspaces": sum(backspaces),
-            "avg_backspaces_per_word": mean(backspaces) if backspaces else 0,
+            "avg_typing_time_per_word": _mean(word_durations),
+            "std_typing_time_per_word": _stdev(word_durations),
+            "avg_pause_before_word": _mean(pauses),
+            "std_pause_before_word": _stdev(pauses),
+            "total_backspaces": int(backspaces.sum()),
+            "avg_backspaces_per_word": _mean(backspaces),
             "typing_speed_wpm": (len(self.words) / self.duration) * 60 if self.duration > 0 else 0,
-            "long_thinking_pauses": len([p for p in pauses if p > 2.0]),  
+            "long_thinking_pauses": int(np.count_nonzero(pauses > 2.0)),
             "typing_bursts": self._get_typing_bursts()
         }
 
         return metrics
 
     def _get_typing_bursts(self, threshold=5.0):
-        bursts = []
-        current_burst = []
-        for w in self.words:
-            if not current_burst:
-                current_burst.append(w)
-            else:
-                pause = w.get("pause_before", 0)
-                if pause > threshold:
-                    bursts.append(current_burst)
-                    current_burst = [w]
-                else:
-                    current_burst.append(w)
-        if current_burst:
-            bursts.append(current_burst)
+        # A new burst starts at every word after the first whose pause exceeds
+        # the threshold; a missing pause never splits a burst.
+        pauses = self.session.columns.pause_before
+        if not pauses.size:
+            return {"total_bursts": 0, "avg_words_per_burst": 0, "longest_burst_length": 0}
+        starts = np.flatnonzero(pauses[1:] > threshold) + 1
+        lengths = np.diff(np.concatenate(([0], starts, [pauses.size])))
         return {
-            "total_bursts": len(bursts),
-            "avg_words_per_burst": mean([len(b) for b in bursts]) if bursts else 0,
-            "longest_burst_length": max([len(b) for b in bursts]) if bursts else 0
+            "total_bursts": int(lengths.size),
+            "avg_words_per_burst": float(lengths.mean()),
+            "longest_burst_length": int(lengths.max())
         }
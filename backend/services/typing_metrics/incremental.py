@@ -0,0 +1,110 @@
+import math
+
+LONG_PAUSE_SECONDS = 2.0
+BURST_PAUSE_SECONDS = 5.0
+
+
+class RunningStats:
+    """Welford's online mean and sample variance."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def average(self):
+        return self.mean if self.count else 0
+
+    def stdev(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2}
+
+
+class TypingAggregate:
+    """Running typing metrics, updated one batch of word events at a time.
+
+    ``finalize`` yields the same metrics as TypingAnalyzer.analyze on the
+    full word list, in O(1), so a streamed essay never has to be replayed.
+    The state round-trips through ``to_dict``/``from_dict`` for storage.
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.words = state.get("words", 0)
+        self.durations = RunningStats(**state.get("durations", {}))
+        self.pauses = RunningStats(**state.get("pauses", {}))
+        self.backspaces = state.get("backspaces", 0)
+        self.long_pauses = state.get("long_pauses", 0)
+        self.closed_bursts = state.get("closed_bursts", 0)
+        self.closed_burst_words = state.get("closed_burst_words", 0)
+        self.longest_burst = state.get("longest_burst", 0)
+        self.current_burst = state.get("current_burst", 0)
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state)
+
+    def to_dict(self):
+        return {
+            "words": self.words,
+            "durations": self.durations.to_dict(),
+            "pauses": self.pauses.to_dict(),
+            "backspaces": self.backspaces,
+            "long_pauses": self.long_pauses,
+            "closed_bursts": self.closed_bursts,
+            "closed_burst_words": self.closed_burst_words,
+            "longest_burst": self.longest_burst,
+            "current_burst": self.current_burst,
+        }
+
+    def update(self, words):
+        for w in words:
+            duration = w.get("duration")
+            pause = w.get("pause_before")
+            if duration is not None:
+                self.durations.add(duration)
+            if pause is not None:
+                self.pauses.add(pause)
+                if pause > LONG_PAUSE_SECONDS:
+                    self.long_pauses += 1
+            self.backspaces += w["backspaces"]
+
+            if self.words and pause is not None and pause > BURST_PAUSE_SECONDS:
+                self.closed_bursts += 1
+                self.closed_burst_words += self.current_burst
+                self.longest_burst = max(self.longest_burst, self.current_burst)
+                self.current_burst = 0
+            self.current_burst += 1
+            self.words += 1
+        return self
+
+    def finalize(self, duration_seconds):
+        bursts = self.closed_bursts + (1 if self.current_burst else 0)
+        burst_words = self.closed_burst_words + self.current_burst
+        return {
+            "total_words": self.words,
+            "total_time_seconds": duration_seconds,
+            "avg_typing_time_per_word": self.durations.average(),
+            "std_typing_time_per_word": self.durations.stdev(),
+            "avg_pause_before_word": self.pauses.average(),
+            "std_pause_before_word": self.pauses.stdev(),
+            "total_backspaces": self.backspaces,
+            "avg_backspaces_per_word": self.backspaces / self.words if self.words else 0,
+            "typing_speed_wpm": (self.words / duration_seconds) * 60 if duration_seconds > 0 else 0,
+            "long_thinking_pauses": self.long_pauses,
+            "typing_bursts": {
+                "total_bursts": bursts,
+                "avg_words_per_burst": burst_words / bursts if bursts else 0,
+                "longest_burst_length": max(self.longest_burst, self.current_burst)
+            }
+        }
@@ -0,0 +1,162 @@
+import atexit
+import logging
+import os
+import threading
+from contextlib import contextmanager
+import language_tool_python
+from backend.services import model_registry
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("LANGUAGETOOL_POOL_SIZE", "2"))
+ACQUIRE_TIMEOUT = float(os.getenv("LANGUAGETOOL_ACQUIRE_TIMEOUT", "60"))
+LANGUAGE = os.getenv("LANGUAGETOOL_LANGUAGE", "en-US")
+
+
+class LanguageToolPoolTimeout(Exception):
+    pass
+
+
+class LanguageToolPool:
+    """Long-lived LanguageTool servers shared by every GrammarChecker.
+
+    At most ``size`` servers are started, and at most ``size`` checks run at
+    once; further callers wait up to ``acquire_timeout`` seconds. A server
+    whose Java process has exited, or whose check raises, is closed and
+    replaced before the next use.
+    """
+
+    def __init__(self, language=LANGUAGE, size=POOL_SIZE, acquire_timeout=ACQUIRE_TIMEOUT):
+        self.language = language
+        self.size = max(1, size)
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._started = 0
+        self._restarts = 0
+        self._closed = False
+
+    def _start_tool(self):
+        logger.info("Starting LanguageTool server (%s)", self.language)
+        return language_tool_python.LanguageTool(self.language)
+
+    @staticmethod
+    def _is_alive(tool):
+        # Local servers keep their Java process on ``_server``; remote ones have none.
+        server = getattr(tool, "_server", None)
+        return server is None or server.poll() is None
+
+    def _discard(self, tool):
+        with self._lock:
+            self._started -= 1
+            self._restarts += 1
+        try:
+            tool.close()
+        except Exception:
+            logger.exception("Failed to close LanguageTool server")
+
+    def _take(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return self._start_tool()
+        except Exception:
+            with self._lock:
+                self._started -= 1
+            raise
+
+    def start(self):
+        """Start every server up front instead of on first use."""
+        with self._lock:
+            missing = self.size - self._started
+            self._started += missing
+        tools = []
+        try:
+            for _ in range(missing):
+                tools.append(self._start_tool())
+        finally:
+            with self._lock:
+                self._started -= missing - len(tools)
+                self._idle.extend(tools)
+        return self
+
+    @contextmanager
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError("LanguageTool pool is closed")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise LanguageToolPoolTimeout("No LanguageTool server became free in time")
+        tool = None
+        try:
+            tool = self._take()
+            if not self._is_alive(tool):
+                logger.warning("LanguageTool server died; restarting")
+                self._discard(tool)
+                tool = self._take()
+            yield tool
+        except Exception:
+            if tool is not None:
+                self._discard(tool)
+                tool = None
+            raise
+        finally:
+            if tool is not None:
+                with self._lock:
+                    self._idle.append(tool)
+            self._slots.release()
+
+    def check(self, text):
+        try:
+            with self.acquire() as tool:
+                return tool.check(text)
+        except LanguageToolPoolTimeout:
+            raise
+        except Exception:
+            # The failing server has been discarded; retry once on a fresh one.
+            logger.warning("LanguageTool check failed; retrying on a new server", exc_info=True)
+            with self.acquire() as tool:
+                return tool.check(text)
+
+    def health(self):
+        with self._lock:
+            idle = list(self._idle)
+            started = self._started
+            restarts = self._restarts
+        return {
+            "size": self.size,
+            "started": started,
+            "idle": len(idle),
+            "idle_alive": sum(1 for tool in idle if self._is_alive(tool)),
+            "restarts": restarts,
+        }
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+        for tool in idle:
+            try:
+                tool.close()
+            except Exception:
+                logger.exception("Failed to close LanguageTool server")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_language_tool_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = LanguageToolPool()
+                atexit.register(_pool.close)
+    return _pool
+
+
+model_registry.register("language_tool", lambda: get_language_tool_pool().start())
@@ -1,27 +1,23 @@
 from backend.services.typing_metrics.analyzer import TypingAnalyzer
 from backend.services.typing_metrics.spell_grammar import GrammarChecker
 from backend.services.typing_metrics.stylometry import StylometryAnalyzer
-
-import tempfile
-import json
-import os
+from backend.services.typing_metrics.session import TypingSession
 
 def analyze_typing_data_dict(data: dict) -> dict:
-    with tempfile.NamedTemporaryFile("w+", delete=False, suffix=".json") as tmp:
-        json.dump(data, tmp)
-        tmp_path = tmp.name
+    return analyze_typing_session(TypingSession.from_dict(data))
 
-    analyzer = TypingAnalyzer(tmp_path)
-    typing_metrics = analyzer.analyze()
+def analyze_typing_session(session: TypingSession, embeddings=None, typing_metrics=None) -> dict:
+    # Streamed submissions arrive with metrics already aggregated.
+    if typing_metrics is None:
+        analyzer = TypingAnalyzer(session)
+        typing_metrics = analyzer.analyze()
 
-    grammar = GrammarChecker(tmp_path)
+    grammar = GrammarChecker(session)
     grammar_report = grammar.check_grammar()
 
-    stylometry = StylometryAnalyzer(tmp_path)
+    stylometry = StylometryAnalyzer(session, embeddings)
     style_report = stylometry.run()
 
-    os.remove(tmp_path)
-
     return {
         "typing_metrics": typing_metrics,
         "grammar_report": {
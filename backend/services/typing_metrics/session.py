@@ -0,0 +1,90 @@
+import json
+from dataclasses import dataclass
+from functools import cached_property
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
+from backend.services.typing_metrics.tokenization import tokenize
+
+
+@dataclass(frozen=True)
+class WordEvent:
+    word: str
+    backspaces: int
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    duration: Optional[float] = None
+    pause_before: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            word=data["word"],
+            backspaces=data["backspaces"],
+            start_time=data.get("start_time"),
+            end_time=data.get("end_time"),
+            duration=data.get("duration"),
+            pause_before=data.get("pause_before"),
+        )
+
+
+class WordColumns(NamedTuple):
+    """Per-word timings as parallel arrays; missing values are NaN."""
+    duration: np.ndarray
+    pause_before: np.ndarray
+    backspaces: np.ndarray
+
+
+def _float_column(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+@dataclass(frozen=True)
+class TypingSession:
+    """One parsed typing-test payload shared by every analyzer.
+
+    The essay text and its tokenization are derived on first access and
+    cached, so each is computed at most once per submission.
+    """
+
+    session_start_time: float
+    session_end_time: float
+    duration_seconds: float
+    words: Tuple[WordEvent, ...] = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            session_start_time=data["session_start_time"],
+            session_end_time=data["session_end_time"],
+            duration_seconds=data["duration_seconds"],
+            words=tuple(WordEvent.from_dict(w) for w in data.get("words", [])),
+        )
+
+    @classmethod
+    def from_file(cls, filepath):
+        with open(filepath, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    @cached_property
+    def text(self):
+        return " ".join(w.word for w in self.words)
+
+    @cached_property
+    def columns(self):
+        return WordColumns(
+            duration=_float_column([w.duration for w in self.words]),
+            pause_before=_float_column([w.pause_before for w in self.words]),
+            backspaces=np.array([w.backspaces for w in self.words], dtype=np.int64),
+        )
+
+    @cached_property
+    def tokenization(self):
+        return tokenize(self.text)
+
+    @property
+    def sentences(self):
+        return self.tokenization.sentences
+
+    @property
+    def tokens(self):
+        return self.tokenization.tokens
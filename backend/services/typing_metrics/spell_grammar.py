@@ -1,22 +1,15 @@
-import json
-import language_tool_python
+from backend.services.typing_metrics.language_tool_pool import get_language_tool_pool
 
 class GrammarChecker:
-    def __init__(self, filepath):
-        with open(filepath, "r") as f:
-            self.data = json.load(f)
+    def __init__(self, session):
+        self.session = session
+        self.words = session.words
+        self.full_text = session.text.strip()
 
-        self.words = self.data.get("words", [])
-        self.full_text = self._reconstruct_text()
-
-        self.tool = language_tool_python.LanguageTool('en-US')
-
-    def _reconstruct_text(self):
-        reconstructed = " ".join([w["word"] for w in self.words])
-        return reconstructed.strip()
+        self.pool = get_language_tool_pool()
 
     def check_grammar(self):
-        matches = self.tool.check(self.full_text)
+        matches = self.pool.check(self.full_text)
 
         grammar_issues = []
         for match in matches:
@@ -0,0 +1,127 @@
+import os
+import re
+from statistics import mean
+from typing import NamedTuple, Tuple
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+TOKENIZER_BACKEND = os.getenv("STYLOMETRY_TOKENIZER", "nltk")
+
+PUNCTUATION = set(".,!?;:")
+
+# Fast path: a regex approximation of Punkt + Treebank. Like Treebank it
+# keeps a word's period ("U.S.", "e.g.") except at the end of a sentence,
+# splits the same contractions ("don't" -> "do", "n't") and turns double
+# quotes into `` and ''. Punkt's trained abbreviation list is replaced by
+# _ABBREVIATIONS and dotted initials, so an unlisted abbreviation ("Eq.")
+# still starts a new sentence. Not the default: run
+# backend.scripts.check_tokenizer_parity before switching scoring to it.
+_SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*(?=\s)")
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "prof", "st", "jr", "sr", "vs", "etc", "approx", "fig"}
+_DOTTED_RE = re.compile(r"(?:^|\s)(?:[A-Za-z]\.)+$")
+_FINAL_PERIOD_RE = re.compile(r"([^.])(\.)([\]\)}>\"']*)\s*$")
+_WORD_RE = re.compile(
+    r"[A-Za-z]+(?=n't\b)|n't\b|'(?:s|ll|re|ve|d|m)\b|\d+(?:[.,]\d+)*(?:-\w+)*(?:\.(?!\.))?"
+    r"|\w+(?:[-.]\w+)*(?:\.(?![.\w]))?|\.\.\.|[^\w\s]",
+    re.IGNORECASE,
+)
+
+
+class Tokenization(NamedTuple):
+    """Sentences plus a flat token list, with each sentence's token span.
+
+    ``bounds[i]:bounds[i + 1]`` slices ``tokens`` for sentence ``i``, so
+    per-sentence word counts never need a second tokenizer pass.
+    """
+
+    sentences: Tuple[str, ...]
+    tokens: Tuple[str, ...]
+    bounds: Tuple[int, ...]
+
+    def sentence_lengths(self):
+        return [end - start for start, end in zip(self.bounds, self.bounds[1:])]
+
+
+def _tokenize(sentences, split_words):
+    tokens = []
+    bounds = [0]
+    for sentence in sentences:
+        tokens.extend(split_words(sentence))
+        bounds.append(len(tokens))
+    return Tokenization(tuple(sentences), tuple(tokens), tuple(bounds))
+
+
+def tokenize_nltk(text):
+    # word_tokenize(text) is Treebank applied to each Punkt sentence, so this
+    # yields exactly its tokens while also recording the sentence spans.
+    return _tokenize(sent_tokenize(text), lambda s: word_tokenize(s, preserve_line=True))
+
+
+def _ends_with_abbreviation(text):
+    word = text.rsplit(None, 1)[-1].lstrip("\"'([") if text.strip() else ""
+    return word[:-1].lower() in _ABBREVIATIONS or bool(_DOTTED_RE.search(text))
+
+
+def split_sentences_fast(text):
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        if match.group() == "." and _ends_with_abbreviation(text[start:match.end()]):
+            continue
+        sentences.append(text[start:match.end()].strip())
+        start = match.end()
+    sentences.append(text[start:].strip())
+    return [s for s in sentences if s]
+
+
+def split_words_fast(sentence):
+    # Treebank only splits off the period that ends the sentence.
+    sentence = _FINAL_PERIOD_RE.sub(r"\1 \2\3 ", sentence)
+    tokens = []
+    for match in _WORD_RE.finditer(sentence):
+        token = match.group()
+        if token == '"':
+            opening = match.start() == 0 or sentence[match.start() - 1] in " ([{<"
+            token = "``" if opening else "''"
+        tokens.append(token)
+    return tokens
+
+
+def tokenize_fast(text):
+    return _tokenize(split_sentences_fast(text.strip()), split_words_fast)
+
+
+BACKENDS = {"nltk": tokenize_nltk, "fast": tokenize_fast}
+
+
+def tokenize(text, backend=None):
+    return BACKENDS[backend or TOKENIZER_BACKEND](text)
+
+
+def stylometry_features(tokenization):
+    words = tokenization.tokens
+    sentences = tokenization.sentences
+
+    punctuations = [w for w in words if w in PUNCTUATION]
+    avg_sentence_len = mean(tokenization.sentence_lengths()) if sentences else 0
+    alpha_lengths = [len(w) for w in words if w.isalpha()]
+    avg_word_len = mean(alpha_lengths) if alpha_lengths else 0
+    lexical_diversity = len(set(words)) / len(words) if words else 0
+
+    return {
+        "total_sentences": len(sentences),
+        "total_words": len(words),
+        "avg_sentence_length": avg_sentence_len,
+        "avg_word_length": avg_word_len,
+        "punctuation_count": len(punctuations),
+        "lexical_diversity": lexical_diversity
+    }
+
+
+def compare_backends(text, backend="fast", reference="nltk"):
+    """Relative difference of each stylometry feature between two backends."""
+    expected = stylometry_features(tokenize(text, reference))
+    actual = stylometry_features(tokenize(text, backend))
+    return {
+        name: abs(actual[name] - value) / max(abs(value), 1)
+        for name, value in expected.items()
+    }
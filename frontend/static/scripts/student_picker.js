@@ -0,0 +1,64 @@
+// Student typeahead for the lecturer's class forms. Expects #student-search,
+// #student-results, #student-more and #picked-students on the page; picked
+// students become checked `fieldName` inputs in #picked-students. With
+// `excludeClass`, students already in that class are left out.
+function studentPicker({ fieldName, excludeClass = null }) {
+    const input = document.getElementById("student-search");
+    const results = document.getElementById("student-results");
+    const more = document.getElementById("student-more");
+    const picked = document.getElementById("picked-students");
+    let query = "", nextAfter = null, timer = null, controller = null;
+
+    async function load(reset) {
+        const params = new URLSearchParams({ q: query });
+        if (excludeClass) params.set("exclude_class", excludeClass);
+        if (!reset && nextAfter) params.set("after", nextAfter);
+        if (reset) {
+            // The old cursor belongs to the old query.
+            nextAfter = null;
+            more.style.display = "none";
+        }
+        // Only the latest request may touch the list: a slower earlier one
+        // (an older query or page) is aborted and its response ignored.
+        if (controller) controller.abort();
+        const current = controller = new AbortController();
+        let data;
+        try {
+            const response = await fetch("/lecturer/students/search?" + params, { signal: current.signal });
+            if (!response.ok) return;
+            data = await response.json();
+        } catch (e) {
+            return;
+        }
+        if (current !== controller) return;
+        if (reset) results.innerHTML = "";
+        for (const s of data.students) {
+            const item = document.createElement("li");
+            item.textContent = `${s.first_name} ${s.last_name} (${s.roll_number})`;
+            item.onclick = () => pick(s, item.textContent);
+            results.appendChild(item);
+        }
+        nextAfter = data.next_after;
+        more.style.display = nextAfter ? "" : "none";
+    }
+
+    function pick(student, label) {
+        if (picked.querySelector(`input[value="${CSS.escape(student.roll_number)}"]`)) return;
+        const row = document.createElement("label");
+        const box = document.createElement("input");
+        box.type = "checkbox";
+        box.name = fieldName;
+        box.value = student.roll_number;
+        box.checked = true;
+        row.append(box, " " + label);
+        row.appendChild(document.createElement("br"));
+        picked.appendChild(row);
+    }
+
+    input.addEventListener("input", () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => { query = input.value; load(true); }, 250);
+    });
+    more.addEventListener("click", () => load(false));
+    load(true);
+}
@@ -1,3 +1,9 @@
+import time
+# First thing, so time-to-first-inference counts the imports below too.
+PROCESS_STARTED = time.perf_counter()
+
+import asyncio
+import logging
 import os
 import sys
 import traceback
@@ -9,6 +15,13 @@ from fastapi.middleware.cors import CORSMiddleware
 
 print("Starting FastAPI app...")
 
+# uvicorn only configures its own loggers; without this the app's INFO
+# records (model load and compile times, worker progress) are dropped.
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
 try:
     load_dotenv()
     app = FastAPI()
@@ -27,13 +40,51 @@ try:
     )
 
 
-    from backend.api import auth, student, lecturer
+    from backend.api import auth, student, lecturer, ops
     
 
     app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
     app.include_router(auth.router)
     app.include_router(student.router)
     app.include_router(lecturer.router)
+    app.include_router(ops.router)
+
+    @app.on_event("startup")
+    async def ensure_db_indexes():
+        if os.getenv("MONGO_ENSURE_INDEXES", "1") == "1":
+            from backend.db.indexes import ensure_indexes
+            try:
+                await ensure_indexes()
+            except Exception:
+                # Serve anyway with whatever indexes were built; the error
+                # lists every index that failed.
+                traceback.print_exc()
+
+    @app.on_event("startup")
+    async def warm_up_models():
+        # Models load in a background thread so the app serves immediately;
+        # /readyz reports progress. Scoring models are only loaded here when
+        # the embedded worker scores in this process.
+        from backend.api.ops import WEB_MODELS
+        from backend.services import model_registry
+        model_registry.mark_process_start(PROCESS_STARTED)
+        if os.getenv("MODEL_WARM_UP", "1") == "1":
+            model_registry.start_warm_up(WEB_MODELS)
+
+    @app.on_event("startup")
+    async def start_embedded_scoring_worker():
+        # Single-process deployments score in-process; set
+        # SCORING_EMBEDDED_WORKER=0 when running backend.scripts.scoring_worker separately.
+        from backend.services.scoring_worker import EMBEDDED_WORKER, run_worker
+        if EMBEDDED_WORKER:
+            app.state.scoring_stop = asyncio.Event()
+            app.state.scoring_worker = asyncio.create_task(run_worker(stop_event=app.state.scoring_stop))
+
+    @app.on_event("shutdown")
+    async def stop_embedded_scoring_worker():
+        if getattr(app.state, "scoring_worker", None):
+            app.state.scoring_stop.set()
+            await app.state.scoring_worker
 
     print("App initialized successfully")
 